@@ -0,0 +1,356 @@
+# -*- coding:utf-8 -*-
+"""
+Offline benchmark of the archive list and the archive links of IPTV Archive plugin.
+
+The recorded EPG payloads of fixtures/ are replayed at 1x, 10x and 100x of their size
+through the steps of the archive screen: parse (with the archive depth filter), sort, rows and glue.
+getArchiveUrl is timed for every archive url type: compile is the first call for the service,
+render is the call with the cached template. getProvider is timed over a few thousand userbouquet
+urls of every provider rule: first is the lookup of a new url, cached is the repeated one.
+XXH32 of their tvg-ids is timed for xxh32_int (the C extension if it's installed), its pure python
+fallback and hash_many.
+startup is the import of plugin.py with Plugins() in a fresh interpreter, as enigma2 does at boot.
+
+    python bench/bench.py [--repeat 5] [--save results.json] [--compare baseline.json]
+
+--save keeps the results of a release, --compare prints the change against the saved ones
+"""
+import os, sys, re, io, json, shutil, tempfile, argparse, subprocess
+from timeit import default_timer as timer
+
+BENCH_PATH = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_PATH = os.path.join(BENCH_PATH, 'fixtures')
+sys.path.insert(0, BENCH_PATH)
+
+import e2stubs
+
+# E2m3u2bouquet config with bcumedia playlist for the bcu archive links
+CFG_PATH = os.path.join(tempfile.mkdtemp(prefix='iptvarchive-bench-'), 'e2m3u2bouquet') + os.sep
+os.makedirs(CFG_PATH)
+shutil.copy(os.path.join(FIXTURES_PATH, 'config.xml'), CFG_PATH)
+e2stubs.install(CFG_PATH)
+sys.path.insert(0, e2stubs.PYTHON_PATH)
+
+from Plugins.Extensions.IPTVarchive import _archive as archive
+from Plugins.Extensions.IPTVarchive._epgparse import getArchiveParser
+from Plugins.Extensions.IPTVarchive._epgglue import glueTitles
+from Plugins.Extensions.IPTVarchive import _xxh32
+
+# fixture file, provider, depth of archive in days
+FORMATS = (
+           ('shura.xml', 'shura', 7),        # shura & 1ott archive.xml
+           ('itv.json', 'itv', 3),           # itv.live {"res": [...]}
+           ('epg_data.json', 'cbilling', 7), # cbilling & tv.team {"epg_data": [...]}
+           ('ottp.json', 'it999', 3),        # OTT-play FOSS EPG [...]
+          )
+SCALES = (1, 10, 100)
+STEPS = ('parse', 'sort', 'rows', 'glue')
+
+# archive url type of getProvider, original url-link, title
+ARCHIVE_URLS = (
+                ('cbilling', 'http://s01.iptvx.tv:8080/s/9f1c2b/perviy.m3u8', ''),
+                ('antifriz', 'http://s2.antifriz.tv:1600/s/7a6b5c/rossia1/video.m3u8', ''),
+                ('zmedia', 'http://192.168.1.10:7000/channel/1tv/index.m3u8?q=1tv', ''),
+                ('zala', 'http://s1.zala.by/live/ont.m3u8', ''),
+                ('1ott', 'http://pl.1ott.net/~a1b2c3/1tv/mono.m3u8', ''),
+                ('tvoetv', 'http://46.174.189.2:8091/ictv/index.m3u8?login=user&key=4f5e', ''),
+                ('bcu', 'http://tv.bcumedia.pro/live/ntv.m3u8', u'НТВ'),
+                ('flussonic', 'http://s1.itv.live/1tv/video.m3u8?token=3c4d', ''),
+                ('tvteam', 'http://tv.team/static/12345/mono.m3u8?token=8e9f', ''),
+                ('1cent', 'http://s1.only4.tv/ch/1tv/index.m3u8?token=5a5b', ''),
+                ('shift', 'http://s1.tvshka.net/perviy/index.m3u8?token=6c6d', ''),
+               )
+URL_LOOPS = 1000    # getArchiveUrl calls per timing
+
+# userbouquet url-links of every rule of PROVIDER_RULES and of unknown providers: provider, url with {ch} and {tk}
+BOUQUET_URLS = (
+                ('cbilling', 'http://s01.iptvx.tv:8080/s/{tk}/{ch}.m3u8'),
+                ('antifriz', 'http://s2.antifriz.tv:1600/s/{tk}/{ch}/video.m3u8'),
+                ('zmedia', 'http://192.168.1.10:7000/channel/{ch}/index.m3u8?q={ch}'),
+                ('iptvx.one', 'http://192.168.1.10:7000/rmtv/{ch}/index.m3u8'),
+                ('zala', 'http://192.168.1.10:7000/zatv/{ch}/index.m3u8'),
+                ('shura', 'http://s1.tvshka.net/{ch}/index.m3u8?token={tk}'),
+                ('1ott', 'http://pl.1ott.net/~{tk}/{ch}/mono.m3u8'),
+                ('only4', 'http://s1.only4.tv/ch/{ch}/index.m3u8?token={tk}'),
+                ('iptvx.one', 'http://s3.satbiling.com/iptv/{tk}/{ch}/index.m3u8'),
+                ('iptvx.one', 'http://s1.crd-s.net/{tk}/{ch}/index.m3u8'),
+                ('shara.club', 'http://sv1.shara.club/live/s.{tk}.{ch}.m3u8'),
+                ('ipstream', 'http://sv1.ipstream.one/live/u.{tk}.{ch}.m3u8'),
+                ('it999', 'http://pl.ilook.tv/iptv/{tk}/{ch}/index.m3u8'),
+                ('iptvx.one', 'http://s1.ottg.tv/{ch}/index.m3u8?token={tk}'),
+                ('fox-tv', 'http://s1.fox-tv.fun/{tk}/{ch}/index.m3u8'),
+                ('online', 'http://s1.iptv.online/play/{tk}/{ch}/index.m3u8'),
+                ('magic', 'http://s1.mymagic.tv/{tk}/{ch}/index.m3u8'),
+                ('shara-tv', 'http://s1.tvfor.pro/{tk}/{ch}/index.m3u8'),
+                ('uz-tv', 'http://s1.uz-tv.net/{tk}/{ch}/index.m3u8'),
+                ('bcu', 'http://tv.bcumedia.pro/live/{ch}.m3u8'),
+                (None, 'http://5.9.10.135:8080/{ch}/index.m3u8?token={tk}'),
+                ('app-greatiptv', 'http://app-greatiptv.cc/{tk}/{ch}/index.m3u8'),
+                ('zala', 'http://s1.zala.by/live/{ch}.m3u8'),
+                ('zala', 'http://178.124.183.20/live/{ch}.m3u8'),
+                ('zabava', 'http://zabava-htlive.cdn.ngenix.net/hls/{ch}/index.m3u8'),
+                ('zabava', 'http://live.cdn.ngenix.net/hls/{ch}/index.m3u8'),
+                ('sharavoz', 'http://s1.spr24.net/{tk}/{ch}/index.m3u8'),
+                ('tvoetv', 'http://s1.onlineott.tv/{ch}/index.m3u8?token={tk}'),
+                (None, 'http://46.174.189.2:8091/{ch}/index.m3u8?login=user&key={tk}'),
+                ('ttv', 'http://85.143.191.10/{tk}/{ch}/index.m3u8'),
+                ('ottclub', 'http://myott.top/stream/{tk}/{ch}.m3u8'),
+                ('itv', 'http://s1.itv.live/{ch}/video.m3u8?token={tk}'),
+                ('itv', 'http://s1.cdn.wf/{ch}/video.m3u8?token={tk}'),
+                ('tvteam', 'http://tv.team/static/{ch}/mono.m3u8?token={tk}'),
+                ('tvteam', 'http://s1.troya.tv/{ch}/mono.m3u8?token={tk}'),
+                ('tvteam', 'http://s1.1usd.tv/{ch}/mono.m3u8?token={tk}'),
+                ('viplime', 'http://s1.cdntv.online/{tk}/{ch}/index.m3u8'),
+                ('propg.net', 'http://s1.tvdosug.tv/{tk}/{ch}/index.m3u8'),
+                (None, 'http://example.com/hls/{ch}/index.m3u8?token={tk}'),
+                (None, 'http://192.168.1.1:8001/{ch}/playlist.m3u8'),
+               )
+CHANNELS = ('perviy', 'rossia1', 'ntv', 'sts', 'tnt', 'ren', 'match', 'karusel', 'mult', 'disney',
+            'kinohit', 'kinomix', 'nashe', 'domkino', 'history', 'discovery', 'animalplanet', 'eurosport', 'rbc', 'zvezda')
+CHANNEL_VARIANTS = ('', '-hd', '-plus2', '-plus4')   # tvg-id suffixes: sd, hd, +2 and +4 hours
+
+STARTUP_CODE = """
+import sys
+sys.path.insert(0, %r)
+import e2stubs
+e2stubs.install()
+sys.path.insert(0, e2stubs.PYTHON_PATH)
+from timeit import default_timer as timer
+start = timer()
+from Plugins.Extensions.IPTVarchive import plugin
+plugin.Plugins()
+print(timer() - start)
+"""
+
+XML_EVENT = re.compile(br'<event id="\d+">.*?</event>\s*', re.DOTALL)
+XML_TIMES = re.compile(br'<start_time>(\d+)</start_time><duration>(\d+)<')
+JSON_ARRAY = {'itv': 'res', 'cbilling': 'epg_data'}
+JSON_TIMES = {'itv': ('startTime', 'stopTime')}
+
+
+def scaleXml(payload, scale, shift):
+    """
+    archive.xml with every event repeated scale times, the copies are a second apart
+    """
+    events = XML_EVENT.findall(payload)
+    head, tail = payload.split(events[0], 1)[0], payload.rsplit(events[-1], 1)[1]
+    body = []
+    for copy in range(scale):
+        for ev in events:
+            ev = re.sub(br'id="(\d+)"', lambda m: ('id="%d"' % (int(m.group(1)) + copy * 1000000)).encode('ascii'), ev)
+            body.append(re.sub(br'<start_time>(\d+)', lambda m: ('<start_time>%d' % (int(m.group(1)) + shift - copy)).encode('ascii'), ev))
+    return head + b''.join(body) + tail
+
+def scaleJson(payload, scale, shift, provider):
+    """
+    JSON payload with every event of the events array repeated scale times, the copies are a second apart
+    """
+    data = json.loads(payload.decode('utf-8'))
+    events = data if isinstance(data, list) else data[JSON_ARRAY[provider]]
+    copies = []
+    for copy in range(scale):
+        for ev in events:
+            ev = dict(ev)
+            for field in JSON_TIMES.get(provider, ('time', 'time_to')):
+                value = int(ev[field]) + shift - copy
+                ev[field] = value if isinstance(ev[field], int) else str(value)
+            copies.append(ev)
+    events[:] = copies
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+def lastEnd(payload, provider):
+    """
+    End of the newest event of the fixture
+    """
+    if provider in ('shura', '1ott'):
+        return max(int(b) + int(d) for b, d in XML_TIMES.findall(payload))
+    end = JSON_TIMES.get(provider, ('time', 'time_to'))[1]
+    return max(int(x) for x in re.findall(('"%s":\\s*"?(\\d+)' % end).encode('ascii'), payload))
+
+def loadPayload(name, provider, scale):
+    """
+    The fixture scaled and moved to end an hour ago, so the depth filter keeps its events
+    """
+    with io.open(os.path.join(FIXTURES_PATH, name), 'rb') as f:
+        payload = f.read()
+    shift = archive.currTime() - 3600 - lastEnd(payload, provider)
+    if provider in ('shura', '1ott'):
+        return scaleXml(payload, scale, shift)
+    return scaleJson(payload, scale, shift, provider)
+
+def runArchiveList(chunks, provider, days):
+    """
+    Seconds of every step of one archive list build, the number of events
+    """
+    times = {}
+    start = timer()
+    parser = getArchiveParser(provider, days)
+    for chunk in chunks:
+        parser.feed(chunk)
+    times['parse'] = timer() - start
+    start = timer()
+    events = parser.close()
+    times['sort'] = timer() - start
+    start = timer()
+    rows = events.rows()
+    times['rows'] = timer() - start
+    start = timer()
+    glueTitles(rows, archive.GLUE_SERIES)
+    times['glue'] = timer() - start
+    return times, len(events)
+
+def benchArchiveList(repeat):
+    """
+    {'<provider> x<scale>': {'events', 'bytes', step: the fastest of repeat runs in ms}}
+    """
+    results = {}
+    for name, provider, days in FORMATS:
+        for scale in SCALES:
+            payload = loadPayload(name, provider, scale)
+            chunks = [payload[i:i + archive.CHUNK_SIZE] for i in range(0, len(payload), archive.CHUNK_SIZE)]
+            result = dict.fromkeys(STEPS, float('inf'))
+            for i in range(repeat):
+                times, count = runArchiveList(chunks, provider, days)
+                for step in STEPS:
+                    result[step] = min(result[step], times[step] * 1000)
+            result.update(events=count, bytes=len(payload))
+            results['%s x%d' % (provider, scale)] = result
+    return results
+
+def benchArchiveUrls(repeat):
+    """
+    {'<archive url type>': {'compile', 'render': the fastest of repeat runs in us per call}}
+    """
+    archive.myStartTime, archive.myDuration, archive.myTimeStamp = archive.currTime() - 7200, 3600, archive.currTime()
+    results = {}
+    for archiveType, url, title in ARCHIVE_URLS:
+        assert archive.getProvider(url)[3] == archiveType, url
+        compileTime = renderTime = float('inf')
+        for i in range(repeat):
+            start = timer()
+            for j in range(URL_LOOPS):
+                archive.archiveUrlTemplates.clear()
+                archive.getArchiveUrl(url, title)
+            compileTime = min(compileTime, timer() - start)
+            start = timer()
+            for j in range(URL_LOOPS):
+                archive.getArchiveUrl(url, title)
+            renderTime = min(renderTime, timer() - start)
+        results[archiveType] = {'compile': compileTime * 1e6 / URL_LOOPS, 'render': renderTime * 1e6 / URL_LOOPS}
+    return results
+
+def benchStartup(repeat):
+    """
+    {'import': the fastest of repeat plugin.py imports in ms}
+    """
+    times = []
+    for i in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', STARTUP_CODE % BENCH_PATH])
+        times.append(float(out.decode('ascii').split()[-1]) * 1000)
+    return {'import': min(times)}
+
+def bouquetUrls():
+    """
+    [(provider, url-link with #sapp_tvgid as E2m3u2bouquet writes it)], every url is unique
+    """
+    urls = []
+    for n, (provider, template) in enumerate(BOUQUET_URLS):
+        for ch in CHANNELS:
+            for copy, suffix in enumerate(CHANNEL_VARIANTS):
+                url = template.format(ch=ch + suffix, tk='%08x' % (0x9e3779b1 * (n * 100 + copy) & 0xffffffff))
+                urls.append((provider, url + '#sapp_tvgid=' + ch + suffix))
+    return urls
+
+def benchProviders(repeat):
+    """
+    {'urls', 'first', 'cached': the fastest of repeat runs in us per getProvider call}
+    """
+    urls = bouquetUrls()
+    for provider, url in urls:
+        assert archive.getProvider(url)[1] == provider, url
+    first = cached = float('inf')
+    for i in range(repeat):
+        archive.providerCache.clear()
+        start = timer()
+        for provider, url in urls:
+            archive.getProvider(url)
+        first = min(first, timer() - start)
+        start = timer()
+        for provider, url in urls:
+            archive.getProvider(url)
+        cached = min(cached, timer() - start)
+    return {'urls': len(urls), 'first': first * 1e6 / len(urls), 'cached': cached * 1e6 / len(urls)}
+
+def benchHashes(repeat):
+    """
+    {'ids', 'backend', 'xxh32_int', 'python', 'hash_many': the fastest of repeat runs in us per tvg-id}
+    """
+    ids = [url.rsplit('#sapp_tvgid=', 1)[1] for provider, url in bouquetUrls()]
+    data = [x.encode('utf-8') for x in ids]
+    fncs = (('xxh32_int', lambda: [_xxh32.xxh32_int(x) for x in ids]),
+            ('python', lambda: [_xxh32._xxh32_int(x) for x in data]),
+            ('hash_many', lambda: _xxh32.hash_many(ids)))
+    assert fncs[0][1]() == fncs[1][1]() == fncs[2][1]()
+    results = {'ids': len(ids), 'backend': 'xxhash' if _xxh32._intdigest else 'python'}
+    for name, fnc in fncs:
+        best = float('inf')
+        for i in range(repeat):
+            start = timer()
+            fnc()
+            best = min(best, timer() - start)
+        results[name] = best * 1e6 / len(ids)
+    return results
+
+def change(value, baseline):
+    if not baseline:
+        return ''
+    return '%+6.1f%%' % ((value - baseline) * 100.0 / baseline)
+
+def report(results, baseline):
+    baseline = baseline or {}
+    print('%-14s %7s %9s  %s' % ('archive list', 'events', 'bytes', '  '.join('%-18s' % (s + ', ms') for s in STEPS)))
+    for name, provider, days in FORMATS:
+        for scale in SCALES:
+            key = '%s x%d' % (provider, scale)
+            r, b = results['list'][key], baseline.get('list', {}).get(key, {})
+            print('%-14s %7d %9d  %s' % (key, r['events'], r['bytes'],
+                  '  '.join('%9.2f %-8s' % (r[s], change(r[s], b.get(s))) for s in STEPS)))
+    print('')
+    print('%-14s %-18s  %-18s' % ('archive url', 'compile, us', 'render, us'))
+    for archiveType, url, title in ARCHIVE_URLS:
+        r, b = results['url'][archiveType], baseline.get('url', {}).get(archiveType, {})
+        print('%-14s %s' % (archiveType, '  '.join('%9.2f %-8s' % (r[s], change(r[s], b.get(s))) for s in ('compile', 'render'))))
+    print('')
+    r, b = results['provider'], baseline.get('provider', {})
+    print('%-14s %-18s  %-18s' % ('provider', 'first, us', 'cached, us'))
+    print('%-14s %s' % ('%d urls' % r['urls'], '  '.join('%9.2f %-8s' % (r[s], change(r[s], b.get(s))) for s in ('first', 'cached'))))
+    print('')
+    r, b = results['hash'], baseline.get('hash', {})
+    steps = ('xxh32_int', 'python', 'hash_many')
+    print('%-14s %s' % ('xxh32 (%s)' % r['backend'], '  '.join('%-18s' % (s + ', us') for s in steps)))
+    print('%-14s %s' % ('%d ids' % r['ids'], '  '.join('%9.2f %-8s' % (r[s], change(r[s], b.get(s))) for s in steps)))
+    print('')
+    r, b = results['startup'], baseline.get('startup', {})
+    print('%-14s %9.2f %-8s' % ('startup, ms', r['import'], change(r['import'], b.get('import'))))
+
+def main():
+    args = argparse.ArgumentParser(description='Offline benchmark of IPTV Archive plugin')
+    args.add_argument('--repeat', type=int, default=5, help='runs of every timing, the fastest is taken')
+    args.add_argument('--save', help='JSON file to save the results to')
+    args.add_argument('--compare', help='JSON file of the saved results to compare with')
+    args = args.parse_args()
+    results = {'version': archive.__version__, 'python': sys.version.split()[0],
+               'list': benchArchiveList(args.repeat), 'url': benchArchiveUrls(args.repeat),
+               'provider': benchProviders(args.repeat), 'hash': benchHashes(args.repeat), 'startup': benchStartup(args.repeat)}
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    shutil.rmtree(os.path.dirname(os.path.dirname(CFG_PATH)), True)
+
+if __name__ == '__main__':
+    main()
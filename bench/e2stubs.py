@@ -0,0 +1,149 @@
+# -*- coding:utf-8 -*-
+"""
+Minimal stand-ins of the enigma2 modules imported by the plugin, so it can be loaded without a box.
+install(cfgPath) must be called before the plugin is imported
+"""
+import os, sys, types
+
+PYTHON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ipk', 'usr', 'lib', 'enigma2', 'python')
+
+
+def module(name, **attrs):
+    m = types.ModuleType(name)
+    m.__dict__.update(attrs)
+    sys.modules[name] = m
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, m)
+    return m
+
+
+class Stub(object):
+    """ Accepts any arguments and has any attribute """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Stub()
+
+    def __call__(self, *args, **kwargs):
+        return Stub()
+
+
+class PluginDescriptor(object):
+    WHERE_EXTENSIONSMENU, WHERE_PLUGINMENU, WHERE_SESSIONSTART = 1, 2, 3
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class eServiceReference(object):
+
+    def __init__(self, ref=''):
+        self.ref = ref
+        fields = ref.split(':')
+        self.path = fields[10].replace('%3a', ':') if len(fields) > 10 else ''
+
+    def getPath(self):
+        return self.path
+
+    def setPath(self, path):
+        self.path = path
+
+    def toString(self):
+        return self.ref
+
+    def __str__(self):
+        return self.ref
+
+
+class eTimer(object):
+
+    def __init__(self):
+        self.callback = []
+
+    def start(self, ms, singleShot=False):
+        pass
+
+    def stop(self):
+        pass
+
+
+class eServiceCenter(object):
+
+    @classmethod
+    def getInstance(cls):
+        return cls()
+
+    def list(self, root):
+        return Stub()
+
+
+class Screen(dict):
+
+    def __init__(self, session):
+        dict.__init__(self)
+        self.session = session
+        self.onClose = []
+        self.onLayoutFinish = []
+
+
+class Config(object):
+    """ config.* tree, every node is created on the first access """
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        node = Config()
+        setattr(self, name, node)
+        return node
+
+    def pickle(self):
+        return ''
+
+
+class Language(object):
+
+    def getLanguage(self):
+        return 'en_US'
+
+    def addCallback(self, callback):
+        pass
+
+
+def install(cfgPath=None):
+    """
+    :param cfgPath: CFGPATH of E2m3u2bouquet with config.xml, None if it isn't installed
+    """
+    module('enigma', eServiceReference=eServiceReference, eServiceCenter=eServiceCenter, eTimer=eTimer)
+    module('ServiceReference', ServiceReference=Stub)
+    module('Plugins', __path__=[os.path.join(PYTHON_PATH, 'Plugins')])
+    module('Plugins.Plugin', PluginDescriptor=PluginDescriptor)
+    module('Plugins.Extensions', __path__=[os.path.join(PYTHON_PATH, 'Plugins', 'Extensions')])
+    if cfgPath:
+        module('Plugins.Extensions.E2m3u2bouquet', __path__=[])
+        module('Plugins.Extensions.E2m3u2bouquet.e2m3u2bouquet', CFGPATH=cfgPath)
+    module('Screens', __path__=[])
+    module('Screens.InfoBar', InfoBar=Stub)
+    module('Screens.InfoBarGenerics', **dict((name, type(name, (object,), {})) for name in
+           ('InfoBarAudioSelection', 'InfoBarNotifications', 'InfoBarSubtitleSupport', 'InfoBarMenu')))
+    module('Screens.MinuteInput', MinuteInput=Stub)
+    module('Screens.Screen', Screen=Screen)
+    module('Screens.EpgSelection', EPGSelection=Screen)
+    module('Screens.ChannelSelection', SimpleChannelSelection=Screen)
+    module('Screens.EventView', EventViewEPGSelect=Stub, EventViewBase=Stub)
+    module('Screens.MessageBox', MessageBox=Stub)
+    module('Components', __path__=[])
+    module('Components.Language', language=Language())
+    module('Components.Button', Button=Stub)
+    module('Components.ActionMap', ActionMap=Stub, HelpableActionMap=Stub)
+    module('Components.Sources', __path__=[])
+    module('Components.Sources.Boolean', Boolean=Stub)
+    module('Components.Sources.Event', Event=Stub)
+    module('Components.config', config=Config())
+    module('Tools', __path__=[])
+    module('Tools.HardwareInfo', HardwareInfo=Stub)
+    module('Tools.Directories', resolveFilename=lambda scope, path: path, SCOPE_PLUGINS=0, SCOPE_LANGUAGE=0, fileExists=os.path.exists)
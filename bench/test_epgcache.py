@@ -0,0 +1,253 @@
+# -*- coding:utf-8 -*-
+"""
+Tests of the EPG disk cache and the revalidation paths of downloadArchive against a local HTTP server.
+
+    python bench/test_epgcache.py
+"""
+import os, sys, io, time, shutil, tempfile, threading, unittest
+
+BENCH_PATH = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_PATH)
+
+import e2stubs
+
+e2stubs.install()
+sys.path.insert(0, e2stubs.PYTHON_PATH)
+
+from Plugins.Extensions.IPTVarchive import _archive as archive
+from Plugins.Extensions.IPTVarchive._epgcache import DiskCache
+from Plugins.Extensions.IPTVarchive._epgparse import parseArchive
+from Plugins.Extensions.IPTVarchive._httppool import ConnectionPool, Cancelled
+
+if sys.version_info[0] == 3:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from urllib.request import Request
+    from urllib.error import URLError, HTTPError
+else:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from urllib2 import Request, URLError, HTTPError
+
+PROVIDER = 'shura'
+DAYS = 36500    # the fixture was recorded long ago, keep all its events
+ETAG = '"v1"'
+
+with io.open(os.path.join(BENCH_PATH, 'fixtures', 'shura.xml'), 'rb') as f:
+    PAYLOAD = f.read()
+
+
+class Handler(BaseHTTPRequestHandler):
+    """ Answers the fixture with ETag, 304 to the matching If-None-Match or the status set on the server """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get('If-None-Match'))
+        if server.status != 200:
+            body = b'error'
+            self.send_response(server.status)
+        elif self.headers.get('If-None-Match') == ETAG:
+            body = b''
+            self.send_response(304)
+        else:
+            body = PAYLOAD
+            self.send_response(200)
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(HTTPServer):
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), Handler)
+        self.status = 200
+        self.requests = []  # If-None-Match of every request
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def url(self, path='/'):
+        return 'http://127.0.0.1:%d%s' % (self.server_port, path)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def expire(cache, key, age=3600):
+    fn = cache.entryPath(key)
+    mtime = time.time() - age
+    os.utime(fn, (mtime, mtime))
+
+
+class DiskCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = DiskCache(self.path, maxSize=1000, defaultTTL=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def store(self, key, payload, etag=None):
+        writer = self.cache.writer(key, etag)
+        writer.write(payload)
+        writer.commit()
+
+    def read(self, key):
+        entry = self.cache.open(PROVIDER, key)
+        if entry is None:
+            return None
+        try:
+            return entry.fresh, entry.f.read(), entry.conditionalHeaders()
+        finally:
+            entry.close()
+
+    def testFresh(self):
+        self.store('a', b'payload', ETAG)
+        self.assertEqual(self.read('a'), (True, b'payload', {'If-None-Match': ETAG}))
+
+    def testExpiredWithValidator(self):
+        self.store('a', b'payload', ETAG)
+        expire(self.cache, 'a')
+        self.assertEqual(self.read('a'), (False, b'payload', {'If-None-Match': ETAG}))
+        self.cache.renew('a')
+        self.assertEqual(self.read('a')[0], True)
+
+    def testExpiredWithoutValidator(self):
+        self.store('a', b'payload')
+        expire(self.cache, 'a')
+        self.assertEqual(self.read('a'), None)
+        self.assertFalse(os.path.exists(self.cache.entryPath('a')))
+
+    def testEvictLeastRecentlyUsed(self):
+        for i, key in enumerate('abc'):
+            self.store(key, b'x' * 300)
+            fn = self.cache.entryPath(key)
+            os.utime(fn, (time.time() - 100 + i, os.stat(fn).st_mtime))   # used in turn, still fresh
+        self.read('a')      # the most recently used now
+        self.store('d', b'x' * 300)
+        self.assertEqual(sorted(k for k in 'abcd' if os.path.exists(self.cache.entryPath(k))), ['a', 'c', 'd'])
+
+
+class DownloadArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.saved = archive.epgCache, archive.httpPool
+        archive.epgCache = DiskCache(self.path, defaultTTL=60)
+        archive.httpPool = ConnectionPool()
+        self.server = Server()
+        self.key = archive.epgCache.makeKey(PROVIDER, self.server.url())
+        self.events = parseArchive(PAYLOAD, PROVIDER, DAYS).rows()
+
+    def tearDown(self):
+        archive.httpPool.clear()
+        archive.epgCache, archive.httpPool = self.saved
+        self.server.stop()
+        shutil.rmtree(self.path)
+
+    def download(self):
+        return archive.downloadArchive(Request(self.server.url()), PROVIDER, DAYS, self.key, 'test').rows()
+
+    def counters(self):
+        return dict((k, v) for k, v in archive.epgCache.counters.items() if v)
+
+    def testDownloadAndHit(self):
+        self.assertEqual(self.download(), self.events)
+        self.assertEqual(self.download(), self.events)
+        self.assertEqual(self.counters(), {'download': 1, 'hit': 1})
+        self.assertEqual(self.server.requests, [None])
+        self.assertEqual(archive.epgCache.report(), 'EPG cache  hit 1  revalidated 0  stale 0  download 1')
+
+    def testRevalidated(self):
+        self.download()
+        expire(archive.epgCache, self.key)
+        self.assertEqual(self.download(), self.events)
+        self.assertEqual(self.server.requests, [None, ETAG])
+        self.assertEqual(self.counters(), {'download': 1, 'revalidated': 1})
+        self.assertEqual(self.download(), self.events)     # renewed by 304
+        self.assertEqual(self.counters(), {'download': 1, 'revalidated': 1, 'hit': 1})
+
+    def testStaleOnServerError(self):
+        self.download()
+        expire(archive.epgCache, self.key)
+        self.server.status = 503
+        self.assertEqual(self.download(), self.events)
+        self.assertEqual(self.counters(), {'download': 1, 'stale': 1})
+
+    def testStaleOnUnreachable(self):
+        self.download()
+        expire(archive.epgCache, self.key)
+        archive.httpPool.clear()
+        self.server.stop()
+        self.assertEqual(self.download(), self.events)
+        self.assertEqual(self.counters(), {'download': 1, 'stale': 1})
+        self.server = Server()  # for tearDown
+
+    def testNotFoundNotServedStale(self):
+        self.download()
+        expire(archive.epgCache, self.key)
+        self.server.status = 404
+        self.assertRaises(HTTPError, self.download)
+
+    def testNoEntryOnServerError(self):
+        self.server.status = 503
+        self.assertRaises(HTTPError, self.download)
+        self.assertEqual(archive.epgCache.open(PROVIDER, self.key), None)
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def run2(self, fnc):
+        """ Calls fnc from two threads at once, returns their results """
+        flight, started, results = archive.SingleFlight(), threading.Event(), []
+
+        def call():
+            try:
+                results.append(flight.do('key', fnc, started))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=call) for i in range(2)]
+        threads[0].start()
+        started.wait(5)
+        threads[1].start()
+        time.sleep(0.1)     # the second one waits for the first
+        for t in threads:
+            t.join(5)
+        return results
+
+    def testShared(self):
+        calls = []
+
+        def fnc(started):
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return len(calls)
+
+        self.assertEqual(self.run2(fnc), [1, 1])
+
+    def testFollowerRunsCancelled(self):
+        calls = []
+
+        def fnc(started):
+            calls.append(1)
+            if len(calls) == 1:
+                started.set()
+                time.sleep(0.2)
+                raise Cancelled()
+            return len(calls)
+
+        results = self.run2(fnc)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(sorted(map(type, results), key=lambda t: t.__name__), [Cancelled, int])
+
+
+if __name__ == '__main__':
+    unittest.main()
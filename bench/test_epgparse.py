@@ -0,0 +1,87 @@
+# -*- coding:utf-8 -*-
+"""
+Tests of the streaming EPG parsers on the bench fixtures.
+
+    python bench/test_epgparse.py
+"""
+import os, sys, io, unittest
+
+BENCH_PATH = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_PATH = os.path.join(BENCH_PATH, 'fixtures')
+sys.path.insert(0, BENCH_PATH)
+
+import e2stubs
+
+e2stubs.install()
+sys.path.insert(0, e2stubs.PYTHON_PATH)
+
+from Plugins.Extensions.IPTVarchive._epgparse import NoArchiveError, getArchiveParser, parseArchive
+from Plugins.Extensions.IPTVarchive._epgstore import EventStore
+
+# fixture file, provider
+FIXTURES = (
+            ('shura.xml', 'shura'),
+            ('itv.json', 'itv'),
+            ('epg_data.json', 'cbilling'),
+            ('ottp.json', 'it999'),
+           )
+DAYS = 36500    # the fixtures were recorded long ago, keep all their events
+CHUNK_SIZES = (1, 7, 100, 4096)
+
+
+def load(name):
+    with io.open(os.path.join(FIXTURES_PATH, name), 'rb') as f:
+        return f.read()
+
+def parseChunks(payload, provider, size):
+    parser = getArchiveParser(provider, DAYS)
+    for i in range(0, len(payload), size):
+        parser.feed(payload[i:i + size])
+    return parser.close()
+
+
+class ArchiveParserTest(unittest.TestCase):
+
+    def testChunksEqualWhole(self):
+        for name, provider in FIXTURES:
+            payload = load(name)
+            whole = parseArchive(payload, provider, DAYS).rows()
+            self.assertTrue(whole, name)
+            for size in CHUNK_SIZES:    # 1 splits every utf-8 character and every token
+                self.assertEqual(parseChunks(payload, provider, size).rows(), whole, '%s by %d' % (name, size))
+
+    def testNewestFirst(self):
+        for name, provider in FIXTURES:
+            btimes = [row[2] for row in parseArchive(load(name), provider, DAYS).rows()]
+            self.assertEqual(btimes, sorted(btimes, reverse=True), name)
+
+    def testDepth(self):
+        for name, provider in FIXTURES:
+            self.assertEqual(len(parseArchive(load(name), provider, 0)), 0, name)
+
+    def testTruncated(self):
+        for name, provider in FIXTURES:
+            payload = load(name)
+            for cut in (len(payload) // 4, len(payload) // 2):  # within the events
+                self.assertRaises((ValueError, SyntaxError), parseChunks, payload[:cut], provider, 100)
+
+    def testNoEvents(self):
+        for payload, provider in ((b'{"res": []}', 'itv'), (b'{"epg_data": null}', 'cbilling'), (b'[]', 'it999'),
+                                  (b'<?xml version="1.0"?><archive></archive>', 'shura')):
+            self.assertRaises(NoArchiveError, parseChunks, payload, provider, 3)
+
+
+class EventStoreTest(unittest.TestCase):
+
+    def testLargeEventId(self):
+        big = sys.maxsize + 1   # 2 ** 31 on 32-bit boxes, doesn't fit array('l')
+        store = EventStore()
+        store.append('d1', big, 1000, 60, 't1')
+        store.append('d2', None, 2000, 60, 't2')
+        store.freeze()
+        self.assertEqual(store.rows(), [('d2', 2000, 2000, 60, 't2'), ('d1', big, 1000, 60, 't1')])
+        self.assertEqual(EventStore.merge([store]).row(1)[1], big)
+
+
+if __name__ == '__main__':
+    unittest.main()
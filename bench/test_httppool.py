@@ -0,0 +1,176 @@
+# -*- coding:utf-8 -*-
+"""
+Regression tests of the EPG connection pool against local HTTP servers.
+
+    python bench/test_httppool.py
+"""
+import os, sys, time, shutil, tempfile, threading, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import e2stubs
+
+e2stubs.install()
+sys.path.insert(0, e2stubs.PYTHON_PATH)
+
+from Plugins.Extensions.IPTVarchive._httppool import ConnectionPool
+from Plugins.Extensions.IPTVarchive._health import HostHealth, CircuitOpenError
+
+if sys.version_info[0] == 3:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.request import Request
+    from urllib.error import URLError
+else:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urllib2 import Request, URLError
+
+
+class Handler(BaseHTTPRequestHandler):
+    """ Answers 'ok' with the protocol and the Connection header of the server """
+
+    def setup(self):
+        self.protocol_version = self.server.protocol
+        BaseHTTPRequestHandler.setup(self)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        if self.server.closeConnection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, protocol, closeConnection):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), Handler)
+        self.protocol = protocol
+        self.closeConnection = closeConnection
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def url(self, path='/'):
+        return 'http://127.0.0.1:%d%s' % (self.server_port, path)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    REQUESTS = 3
+
+    def fetch(self, pool, server):
+        resp = pool.urlopen(Request(server.url()))
+        try:
+            return resp.read(), resp.connectTime
+        finally:
+            resp.close()
+
+    def check(self, protocol, closeConnection, health=None):
+        server = Server(protocol, closeConnection)
+        pool = ConnectionPool(health=health)
+        try:
+            for i in range(self.REQUESTS):
+                body, connectTime = self.fetch(pool, server)
+                self.assertEqual(body, b'ok')
+                if closeConnection or protocol == 'HTTP/1.0':
+                    self.assertTrue(connectTime is not None, 'request %d used a closed connection' % i)
+                elif i:
+                    self.assertTrue(connectTime is None, 'request %d did not reuse the connection' % i)
+        finally:
+            pool.clear()
+            server.stop()
+
+    def testKeepAlive(self):
+        self.check('HTTP/1.1', False)
+
+    def testConnectionClose(self):
+        self.check('HTTP/1.1', True)
+
+    def testHttp10(self):
+        self.check('HTTP/1.0', False)
+
+    def testMaxIdlePerHost(self):
+        server = Server('HTTP/1.1', False)
+        pool = ConnectionPool(maxIdlePerHost=2)
+        try:
+            resps = [pool.urlopen(Request(server.url())) for i in range(4)]    # concurrent, each on a connection of its own
+            for resp in resps:
+                self.assertEqual(resp.read(), b'ok')
+                resp.close()
+            self.assertEqual([len(conns) for conns in pool.idle.values()], [2])
+        finally:
+            pool.clear()
+            server.stop()
+
+    def testConnectionCloseWithHealth(self):
+        health = HostHealth(os.devnull)
+        self.check('HTTP/1.1', True, health)
+        self.assertEqual([s['failures'] for s in health.hosts.values()], [0])
+
+    def testCircuitOpen(self):
+        health = HostHealth(os.devnull, maxFailures=2, coolDown=60)
+        server = Server('HTTP/1.1', False)
+        url = server.url()
+        server.stop()
+        pool = ConnectionPool(health=health)
+        for i in range(2):
+            self.assertRaises(URLError, pool.urlopen, Request(url))
+        start = time.time()
+        self.assertRaises(CircuitOpenError, pool.urlopen, Request(url))
+        self.assertTrue(time.time() - start < 0.1)
+
+
+class HostHealthTest(unittest.TestCase):
+
+    def testTimeoutAfterFailure(self):
+        health = HostHealth(os.devnull, maxTimeout=5, maxFailures=1, coolDown=0)
+        for i in range(health.minSamples):
+            health.success('h:80', 0.1)
+        self.assertEqual(health.timeout('h:80'), health.minTimeout)
+        health.failure('h:80')
+        self.assertEqual(health.timeout('h:80'), health.maxTimeout)
+        self.assertTrue(health.allow('h:80'))      # the half-open probe
+        self.assertFalse(health.allow('h:80'))
+        health.success('h:80', 0.1)
+        self.assertEqual(health.timeout('h:80'), health.minTimeout)
+
+    def testSaveOnChange(self):
+        path = tempfile.mkdtemp()
+        stateFile, samplesFile = os.path.join(path, 'health'), os.path.join(path, 'samples')
+        try:
+            health = HostHealth(stateFile, maxFailures=1, samplesFile=samplesFile)
+            health.success('h:80', 0.1)
+            health.save()
+            self.assertFalse(os.path.exists(stateFile))     # the answer times don't touch the flash
+            self.assertTrue(os.path.exists(samplesFile))
+            health.failure('h:80')
+            health.save()
+            self.assertTrue(os.path.exists(stateFile))
+            os.remove(stateFile)
+            os.remove(samplesFile)
+            health.save()
+            self.assertFalse(os.path.exists(stateFile) or os.path.exists(samplesFile))
+            health.success('h:80', 0.2)     # closes the circuit
+            health.save()
+            health.failure('h:80')
+            health.save()
+            loaded = HostHealth(stateFile, maxFailures=1, samplesFile=samplesFile)
+            loaded.load()
+            self.assertEqual(loaded.hosts, health.hosts)
+            self.assertTrue('open' in loaded.report())
+        finally:
+            shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
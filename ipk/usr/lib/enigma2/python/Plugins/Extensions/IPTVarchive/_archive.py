@@ -0,0 +1,1523 @@
+# -*- coding:utf-8 -*-
+"""
+The archive screens and the EPG archive loading, imported by plugin.py on the first use
+"""
+from . import _
+import os, sys, time, re
+import tempfile, zlib
+from threading import Thread, Lock, Event as ThreadEvent
+from collections import deque
+from timeit import default_timer as timer
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+PY3 = (sys.version_info[0] == 3)
+if PY3:
+    from urllib.request import Request
+    from urllib.error import URLError, HTTPError
+    from urllib.parse import urlparse, parse_qs, parse_qsl, urlencode, unquote, quote
+else:
+    from urllib import urlencode, unquote, quote
+    from urllib2 import Request, URLError, HTTPError
+    from urlparse import urlparse, parse_qs, parse_qsl
+
+from enigma import eServiceReference, eServiceCenter, eTimer
+from ServiceReference import ServiceReference
+from Screens.InfoBar import InfoBar
+from Screens.InfoBarGenerics import InfoBarAudioSelection, InfoBarNotifications, InfoBarSubtitleSupport, InfoBarMenu
+from Screens.MinuteInput import MinuteInput
+from Screens.Screen import Screen
+from Screens.EpgSelection import EPGSelection
+from Screens.ChannelSelection import SimpleChannelSelection
+from Screens.EventView import EventViewEPGSelect, EventViewBase
+from Screens.MessageBox import MessageBox
+from Components.Button import Button
+from Components.ActionMap import ActionMap, HelpableActionMap
+from Components.Sources.Boolean import Boolean
+from Components.Sources.Event import Event
+from Components.config import config
+from Tools.HardwareInfo import HardwareInfo
+from ._epgcache import DiskCache, MemoryCache
+from ._epgparse import NoArchiveError, getArchiveParser
+from ._epgstore import EventStore
+from ._epgindex import EpgIndex
+from ._epgglue import glueTitles
+from ._httppool import ConnectionPool, CancelToken, Cancelled
+from ._health import HostHealth
+from ._stats import LatencyStats, SourceStats
+from . import _log
+from .plugin import WARMUP_CHANNELS
+
+try:
+    from Plugins.Extensions.E2m3u2bouquet.e2m3u2bouquet import CFGPATH
+except ImportError:
+    CFGPATH = None
+
+__author__ = 'alex1992, Vasiliks, Dorik1972, prog4food'
+__version__ = '2.03'
+__date__ = '2018-08-15'
+__updated__ = '2020-11-22'
+__foss_updated__ = '2023-04-20'
+
+currTime = lambda: int(round(time.time()))
+myStartTime = 0     # save last startTime
+myDuration = 0      # save duration of played event
+myTimeStamp = 0     # save timestamp of the last start
+iptvHotKey = ''     # HotKey for Plugin
+SIGN = chr(174) if PY3 else unichr(174).encode('utf-8')  # (R) symbol
+
+paramExist = lambda fn, param: param in fn.__code__.co_varnames[:fn.__code__.co_argcount]
+
+# _log.DEBUG adds the EPG requests and archive links, _log.OFF disables the log
+log = _log.Logger(os.path.join(tempfile.gettempdir(), 'iptv_archive_plugin.log'), level=_log.WARNING)
+
+HEADERS = { 'User-Agent': 'Mozilla/5.0 (SmartHub; SMART-TV; U; Linux/SmartTV; Maple2012) AppleWebKit/534.7 (KHTML, like Gecko) SmartTV Safari/534.7',
+            'Accept-encoding': 'gzip, deflate',
+           }
+
+# Lifetime of the cached EPG archive in seconds by provider
+# Native APIs add the just finished events, OTT-play FOSS EPG is rebuilt a few times a day
+EPG_CACHE_TTL = { 'shura': 600, '1ott': 600, 'itv': 600, 'cbilling': 900, 'tvteam': 900, 'ottclub': 900,
+                  'shara.club': 900, 'ipstream': 900,
+                  'it999': 3600, 'app-greatiptv': 3600, 'iptvx.one': 3600, 'only4': 3600, 'bcu': 3600, 'propg.net': 3600,
+                  'ottp': 3600,
+                }
+epgCache = DiskCache(os.path.join(tempfile.gettempdir(), 'iptv_archive_cache'), ttl=EPG_CACHE_TTL)
+archiveLists = MemoryCache(ttl=EPG_CACHE_TTL)    # EventStore of the parsed archive by service reference
+CHUNK_SIZE = 16384         # bytes of EPG payload read at once
+PREFETCH_NEIGHBOURS = 2     # channels before and after the current one to prefetch
+PREFETCH_WORKERS = 2        # max simultaneous prefetch downloads
+# EPG APIs giving the events of one day: provider -> (query parameter of the day, its strftime format).
+# Their archive is fetched day by day, up to DAY_FETCH_WORKERS requests at once
+DATE_PAGED_APIS = {'cbilling': ('date', '%Y-%m-%d')}
+DAY_FETCH_WORKERS = 3
+# Native APIs mirrored by OTT-play FOSS EPG: their archive is requested from both sources, see loadArchiveHedged
+HEDGED_PROVIDERS = ('itv', 'tvteam', 'shara.club', 'ipstream')
+HEDGE_DELAY = 1.0           # seconds to wait for the first source before the other one is requested
+OTTP_MIRROR = 'ottp'        # provider of the mirror answers in epgCache, latency and getArchiveParser
+httpPool = ConnectionPool(maxIdlePerHost=2, idleTimeout=30, timeout=5)   # keep-alive connections to EPG APIs
+latency = LatencyStats()     # per provider latency histograms, exported to iptv_archive_stats.json with epgCache counters
+sourceStats = SourceStats(failPenalty=httpPool.timeout)    # record of the hedged EPG sources
+GLUE_SERIES = False         # glued titles view shows a series once, not every episode
+WARMUP_INTERVAL = 60        # seconds between the warm-up runs
+WARMUP_WORKERS = 1          # max simultaneous warm-up downloads
+WARMUP_TRAFFIC = 8 * 1024 * 1024   # bytes of EPG traffic per hour the warm-up doesn't exceed
+WARMUP_BACKOFF = (120, 3600)       # seconds before the retry after the first failure, max delay
+WARMUP_SAVE_INTERVAL = 3600 # min seconds between the writes of the opening counts to the flash
+
+def getBoxInfo():
+    res = {}.fromkeys(['model', 'distro', 'imagever'], 'unknown')
+    for f in ['hwmodel', 'gbmodel', 'boxtype', 'vumodel', 'azmodel', 'model']:
+        try:
+            with open('/proc/stb/info/' + f, 'r') as f:
+                res['model'] = ''.join(f.readlines()).strip()
+                break
+        except:
+            continue
+    try:
+        with open('/etc/issue') as f:
+            res['distro'], res['imagever'] = f.readlines()[-2].strip()[:-6].lower().split()
+    except:
+        pass
+    return res
+
+STATIC_INFO_DIC = {}    # model, distro, imagever of the box, probed by boxInfo() on the first use
+
+def boxInfo():
+    if not STATIC_INFO_DIC:
+        STATIC_INFO_DIC.update(getBoxInfo())
+    return STATIC_INFO_DIC
+
+# config.misc subsections of the hotkey bindings: hotkey (OpenPLi, OpenATV), ButtonSetup (OpenViX, OpenBH)
+HOTKEY_SECTIONS = ('hotkey', 'ButtonSetup')
+hotKeyValid = False     # iptvHotKey is resolved and no binding has changed since
+hotKeyWatched = set()   # id of the bindings with hotKeyChanged notifier
+
+def hotKeyChanged(configElement=None):
+    global hotKeyValid
+    hotKeyValid = False
+
+def getHotKey():
+    """
+    Returns the name of the hotkey bound to the plugin or ''.
+    The hotkey sections are scanned once, a change of any binding makes the next call scan them again.
+    The images without these sections get the whole config scanned once per session
+    """
+    global iptvHotKey, hotKeyValid
+    if hotKeyValid:
+        return iptvHotKey
+    bindings = []
+    for name in HOTKEY_SECTIONS:
+        try:
+            bindings.extend(getattr(config.misc, name).dict().items())
+        except (AttributeError, KeyError):
+            pass
+    iptvHotKey = ''
+    if bindings:
+        for key, element in bindings:
+            if id(element) not in hotKeyWatched:
+                element.addNotifier(hotKeyChanged, initial_call=False)
+                hotKeyWatched.add(id(element))
+            if not iptvHotKey and 'Plugins/Extensions/IPTVarchive' in str(element.value):
+                iptvHotKey = key
+    else:
+        for l in config.pickle().split('\n'):
+            if 'Plugins/Extensions/IPTVarchive' in l:
+                iptvHotKey = l.split('=')[0].split('.')[-1]
+                break
+    hotKeyValid = True
+    return iptvHotKey
+
+def query_get(query, key, default=''):
+    '''
+    Helper for getting values from a pre-parsed query string
+    '''
+    return parse_qs(query).get(key, [default])[0]
+
+# IPTV provider detection rules in order of priority:
+#   url pattern : (provider name, depth of archive in days, archive url type for getArchiveUrl)
+PROVIDER_RULES = (
+                  ('iptvx.tv'    , 'cbilling', 7,   'cbilling'),  # cbilling.me
+                  ('.antifriz.'  , 'antifriz', 7,   'antifriz'),  # antifriz.tx
+                  ('/channel/'   , 'zmedia', 3,     'zmedia'),    # ZMedia Proxy vps https://t.me/wink_news/107
+                  ('/rmtv/'      , 'iptvx.one', 7,  'zmedia'),    # ZMedia Proxy local
+                  ('/zatv/'      , 'zala', 2,       'zmedia'),    # ZMedia Proxy local zala.by
+                  ('tvshka.net'  , 'shura', 7,      'shift'),     # shura.tv
+                  ('1ott.'       , '1ott', 8,       '1ott'),      # my.1ott.net
+                  ('only4.tv'    , 'only4', 7,      '1cent'),     # 1cent.tv
+                  ('satbiling.com', 'iptvx.one', 7, '1cent'),     # iptv.satbilling.com
+                  ('.crd-s.'     , 'iptvx.one', 3,  'shift'),     # crdru.net
+                  ('/live/s.'    , 'shara.club', 2, 'shift'),     # shara.club
+                  ('/live/u.'    , 'ipstream', 3,   'shift'),     # ipstream.one
+                  ('/iptv/'      , 'it999', 3,      'shift'),     # it999.tv (ilook.tv)
+                  ('.ottg.'      , 'iptvx.one', 7,  'flussonic'), # glanz (ottg.tv)
+                  ('.fox-tv.'    , 'fox-tv', 5,     'shift'),     # fox-tv.fun
+                  ('.iptv.'      , 'online', 1,     'shift'),     # iptv.online
+                  ('.mymagic.'   , 'magic', 7,      'shift'),     # mymagic.tv
+                  ('tvfor.pro'   , 'shara-tv', 5,   'shift'),     # shara-tv.org
+                  ('uz-tv'       , 'uz-tv', 5,      'shift'),     # uz-tv.net
+                  ('.bcumedia.pro', 'bcu', 2,       'bcu'),       # bcumedia.pro
+                  ('5.9.10.135'  , None, 0,         'bcu'),       # bcumedia.pro archive server
+                  ('app-greatiptv', 'app-greatiptv', 7, 'shift'), # app.greatiptv.cc
+                  ('.zala.'      , 'zala', 2,       'zala'),      # zala.by
+                  ('178.124.183.', 'zala', 2,       'zala'),      # zala.by
+                  ('zabava'      , 'zabava', 3,     'zala'),      # zabava.tv
+                  ('cdn.ngenix.net', 'zabava', 3,   'zala'),      # zabava.tv
+                  ('.spr24.'     , 'sharavoz', 3,   'shift'),     # sharavoz.tv
+                  ('.onlineott.' , 'tvoetv', 5,     'tvoetv'),    # tvoetv.in.ua
+                  ('46.174.189'  , None, 0,         'tvoetv'),    # tvoetv.in.ua archive server
+                  ('85.143.191.' , 'ttv', 5,        'shift'),     # ttv.run
+                  ('myott.top'   , 'ottclub', 5,    'shift'),     # ottclub.cc
+                  ('.itv.'       , 'itv', 3,        'flussonic'), # itv.live
+                  ('cdn.wf'      , 'itv', 3,        'flussonic'), # itv.live
+                  ('tv.team'     , 'tvteam', 7,     'tvteam'),    # tv.team
+                  ('troya.tv'    , 'tvteam', 7,     'tvteam'),    # tv.team
+                  ('1usd.tv'     , 'tvteam', 7,     'tvteam'),    # tv.team
+                  ('cdntv.online', 'viplime', 3,    'shift'),     # viplime.fun
+                  ('.tvdosug.'   , 'propg.net', 1,  'shift'),     # tvdosug.tv
+                 )
+UNKNOWN_PROVIDER = ('', None, 0, 'shift')
+# One pass of the lookahead alternation finds every (even overlapping) pattern in the url
+PROVIDER_MATCHER = re.compile('(?=(%s))' % '|'.join([re.escape(x[0]) for x in PROVIDER_RULES]))
+PROVIDER_PRIORITY = dict([(x[0], i) for i, x in enumerate(PROVIDER_RULES)])
+providerCache = {}  # url -> rule
+
+def getProvider(url):
+    """
+    Returns the first by priority rule of PROVIDER_RULES matching the url-link from userbouquet serviceref
+
+    :param url: original url-link
+    :rtype: tuple (url pattern, provider name, depth of archive in days, archive url type)
+    """
+    rule = providerCache.get(url)
+    if rule is None:
+        found = [PROVIDER_PRIORITY[m.group(1)] for m in PROVIDER_MATCHER.finditer(url)]
+        rule = PROVIDER_RULES[min(found)] if found else UNKNOWN_PROVIDER
+        if len(providerCache) > 4096:
+            providerCache.clear()
+        providerCache[url] = rule
+    return rule
+
+# Placeholders of the variable parts of archive link, no url contains control characters
+ARCHIVE_URL_FIELDS = {'start': '\x01', 'duration': '\x02', 'timestamp': '\x03', 'offset': '\x04'}
+BCU_TOKEN_FIELD = '\x05'  # the token may change while the template is cached, it's rendered as %(bcuToken)s
+archiveUrlTemplates = {}  # url -> template of archive link
+BCU_ARCHIVE_HOST = '5.9.10.135:8080'
+bcuToken = (None, '')     # mtime of CFGPATH/config.xml, bcumedia token read from it
+bcuTitleHashes = {}       # url -> (channel title, its md5 for bcumedia archive links)
+
+def getBcuToken():
+    """
+    The token of bcumedia playlist from E2m3u2bouquet config.xml, the file is read again only when its mtime changes
+    """
+    global bcuToken
+    cfg_file = os.path.join(CFGPATH, 'config.xml')
+    try:
+        mtime = os.stat(cfg_file).st_mtime
+    except OSError:
+        return ''
+    if mtime != bcuToken[0]:
+        with open(cfg_file, 'r') as f:
+            token = re.findall(r"\[(https:\/\/bcumedia.pro.+?)\]", f.read())
+        token = os.path.splitext(os.path.basename(token[0]))[0] if token else ''
+        bcuToken = (mtime, token)
+    return bcuToken[1]
+
+def getBcuTitleHash(url, title):
+    """
+    md5 of the channel title, computed once per channel. The seeks call getArchiveUrl without the title
+    """
+    cached = bcuTitleHashes.get(url)
+    if cached is None or title and title != cached[0]:
+        from hashlib import md5
+        cached = bcuTitleHashes[url] = (title, md5(title if isinstance(title, bytes) else title.encode('utf-8')).hexdigest()[:9])
+    return cached[1]
+
+def compileArchiveUrl(url, title=''):
+    """
+    This function converts the original url-link from userbouquet serviceref to a template of archive link
+    with %(start)d, %(duration)d, %(offset)d, %(timestamp)d and %(bcuToken)s fields for renderArchiveUrl
+
+    :param url: original url-link
+    :type url: str
+    :rtype url: str (template of url-link to archive broadcast)
+    """
+    # the variable parts of archive link are placeholders here
+    myStartTime, myDuration, myTimeStamp, myOffset = [ARCHIVE_URL_FIELDS[x] for x in ('start', 'duration', 'timestamp', 'offset')]
+    parsed_url = urlparse(url)
+    splittedpath = parsed_url.path.split('/')
+    token = query_get(parsed_url.query, 'token')
+    archiveType = getProvider(url)[3]
+    log.debug('Title: %s', title)
+
+    # cbilling
+    if archiveType == 'cbilling':
+        if not 'video-timeshift' in splittedpath[-1]:
+            if not token: token = splittedpath[2]
+            if parsed_url.scheme == 'rtmp': #RTMP Enigma2 playlist
+                parsed_url = parsed_url._replace(scheme='http')
+            url = parsed_url._replace(netloc= '%s' % parsed_url.netloc.split(':')[0])._replace(query='token=%s' % token). \
+                      _replace(path='%s/video-timeshift_abs-%s.m3u8' % (splittedpath[2] if 'static' in splittedpath else splittedpath[-1].split('.')[0] if 's' in splittedpath else splittedpath[1], myStartTime))
+        else:
+            url = parsed_url._replace(path='%s/video-timeshift_abs-%s.m3u8' % (splittedpath[1], myStartTime))
+    # antifriz
+    elif archiveType == 'antifriz':
+        if not token: token = splittedpath[2]
+        if 'static' in splittedpath: #RTMP Enigma2 playlist
+            splittedpath.append('video.m3u8')
+            splittedpath.remove('static')
+            parsed_url = parsed_url._replace(scheme='http')._replace(path='/'.join(splittedpath))
+
+        url = parsed_url._replace(netloc='%s:80' % parsed_url.hostname)._replace(query='token=%s' % token). \
+                          _replace(path='%s/archive-%s-%s.m3u8' % (splittedpath[-2], myStartTime, myDuration))
+    # ZMediaProxy -  RT/Zabava/wink/zala
+    elif archiveType == 'zmedia':
+        q = query_get(parsed_url.query, 'q')
+        url = parsed_url._replace(query='q=%s&offset=%s&utcstart=%s' % (q, myOffset, myTimeStamp))
+    # zala.by & zabava.tv
+    elif archiveType == 'zala':
+        url = parsed_url._replace(query='version=2&offset=%s' % myOffset)
+    # 1ott
+    elif archiveType == '1ott':
+        url = parsed_url._replace(query='archive=%s' % myStartTime)
+    # tvoetv.in.ua
+    elif archiveType == 'tvoetv':
+        login = query_get(parsed_url.query, 'login')
+        key = query_get(parsed_url.query, 'key')
+        if not '46.174.189.' in url:
+            parsed_url = urlparse(unquote(query_get(parsed_url.query, 'url')))._replace(netloc='46.174.189.2:8091')
+            splittedpath = parsed_url.path.split('/')
+
+        url = parsed_url._replace(path='%s/archive-%s-%s.m3u8' % (splittedpath[1], myStartTime, myDuration)). \
+                          _replace(query='login=%s&key=%s' % (login, key))
+    # bcumedia
+    elif archiveType == 'bcu' and CFGPATH:
+        if '.bcumedia.pro' in url:
+            url = urlparse('http://%s/%s/video-%s-%s.m3u8?token=%s' % (BCU_ARCHIVE_HOST, getBcuTitleHash(url, title), myStartTime, myDuration, BCU_TOKEN_FIELD))
+        else:
+            url = parsed_url._replace(path='%s/video-%s-%s.m3u8' % (splittedpath[1], myStartTime, myDuration))
+
+    # itv.live & glanz & Other flussonic type with catchup-type="flussonic"
+    elif archiveType == 'flussonic':
+        url = parsed_url._replace(path='%s/index-%s-%s.m3u8' % (splittedpath[1], myStartTime, myDuration))
+    # tv.team & 1cent & shura & ottclub & it999 & shara.club & fox-tv & Other with catchup="shift" or catchup="append"
+    else:
+        # tv.team
+        if archiveType == 'tvteam' and 'static' in splittedpath: #RTMP Enigma2 playlist
+                splittedpath.append('mono.m3u8')
+                splittedpath.remove('static')
+                parsed_url = parsed_url._replace(netloc='%s:24000' % parsed_url.netloc.split(':')[0])
+                parsed_url = parsed_url._replace(scheme='http')._replace(path='/'.join(splittedpath))
+        # 1cent
+        if archiveType == '1cent' and not '82' in parsed_url.netloc:
+            parsed_url = parsed_url._replace(netloc='%s:82' % parsed_url.netloc.split(':')[0])
+
+        url = parsed_url._replace(query='token=%s&utc=%s&lutc=%s' % (token, myStartTime, myTimeStamp)) if token else parsed_url._replace(query='utc=%s&lutc=%s' % (myStartTime, myTimeStamp))
+
+    template = url.geturl().replace('%', '%%')
+    for name, field in ARCHIVE_URL_FIELDS.items():
+        template = template.replace(field, '%%(%s)d' % name)
+    return template.replace(BCU_TOKEN_FIELD, '%(bcuToken)s')
+
+def renderArchiveUrl(template, startTime, duration, timeStamp):
+    fields = {'start': startTime, 'duration': duration, 'timestamp': timeStamp, 'offset': startTime - currTime()}
+    if '%(bcuToken)s' in template:
+        fields['bcuToken'] = getBcuToken()
+    return template % fields
+
+def getArchiveUrl(url, title=''):
+    """
+    This function converts the original url-link from userbouquet serviceref to an archive link
+    for the current myStartTime, myDuration and myTimeStamp.
+    The template of archive link is compiled once per service
+
+    :param url: original url-link
+    :type url: str
+    :rtype url: str (url-link to archive broadcast)
+    """
+    template = archiveUrlTemplates.get(url)
+    if template is None:
+        if len(archiveUrlTemplates) > 1024:
+            archiveUrlTemplates.clear()
+        template = archiveUrlTemplates[url] = compileArchiveUrl(url, title)
+    url = renderArchiveUrl(template, myStartTime, myDuration, myTimeStamp)
+    log.debug('Archive url: %s', url)
+
+    return url
+
+
+# For e2m3u2b compatibility with OTT-play FOSS EPG
+OTTP_EPG_PROVIDERS = ('it999', 'app-greatiptv', 'iptvx.one', 'only4', 'bcu', 'propg.net'
+                      # нет поддержки
+                      # 'fox-tv', 'antifriz', 'magic', 'uz-tv', 'shara-tv', 'viplime'
+                     )
+OTTP_EPG_URL = 'http://epg.ottp.eu.org/%s/epg/%s.json'
+
+def getOttpEpg(url):
+    """
+    :rtype: tuple (provider, xxh32 of tvg-id, EPG url) of OTT-play FOSS EPG or None if the service has no such EPG,
+            for the provider of HEDGED_PROVIDERS it's the mirror of the native API
+    """
+    params = dict(parse_qsl(urlparse(url).fragment))
+    provider = getProvider(url)[1]
+    if (provider in OTTP_EPG_PROVIDERS or provider in HEDGED_PROVIDERS) and 'sapp_tvgid' in params:
+        from ._xxh32 import xxh32_int
+        tvgHash = xxh32_int(params['sapp_tvgid'])
+        return provider, tvgHash, OTTP_EPG_URL % (provider, tvgHash)
+    return None
+
+def getMirrorRequest(url, provider):
+    """
+    :rtype: Request of the channel archive from OTT-play FOSS EPG for the provider of HEDGED_PROVIDERS or None
+    """
+    entry = epgIndex.get(url) if provider in HEDGED_PROVIDERS else None
+    return Request(entry[2], headers=HEADERS) if entry else None
+
+BOUQUETS_PATH = os.path.dirname(os.path.normpath(CFGPATH)) if CFGPATH else None  # CFGPATH is <bouquets>/e2m3u2bouquet/
+epgIndex = EpgIndex(BOUQUETS_PATH, os.path.join(BOUQUETS_PATH or tempfile.gettempdir(), 'iptvarchive.epgindex'), getOttpEpg)
+
+
+def getEpgRequest(url, chName):
+    """
+    This function resolves the IPTV provider of the url-link from userbouquet serviceref
+    and builds the request of the EPG archive
+
+    :param url: original url-link
+    :param chName: channel name
+    :rtype: tuple (provider, depth of archive in days, Request or None for unknown provider or provider without EPG source)
+    """
+    parsed_url = urlparse(url)
+    params = dict(parse_qsl(parsed_url.fragment))
+    splittedpath = parsed_url.path.split('/')
+    # Provider name, Depth of archive in days
+    start = timer()
+    provider, days = getProvider(url)[1:3]
+    resolved = timer()
+    if 'sapp_catchup-days' in params:
+        days = int(params['sapp_catchup-days'])
+        if provider is None:
+            provider = 'flussonic'
+
+    if provider is None:
+        return provider, days, None
+    # shura & 1ott Native API
+    elif provider in ('shura', '1ott'):
+        epgUrl = Request(parsed_url._replace(path='/'.join(splittedpath[:3]) + '/epg/archive.xml').geturl(), headers=HEADERS)
+    # ottclub Native API
+    elif provider == 'ottclub':
+        epgUrl = Request('http://spacetv.in/api/channel/%s' % splittedpath[-1].split('.')[0], headers=HEADERS)
+    # itv.live Native API
+    elif provider == 'itv':
+        data = urlencode({ 'action': 'epg',
+                           'chid'  : splittedpath[-2],
+                           'name'  : chName,
+                           'token' : query_get(parsed_url.query, 'token'),
+                           'serv'  : parsed_url.netloc.split(':')[0],
+                         }).encode('utf-8')
+        epgUrl = Request('http://api.itv.live/epg.php', data, HEADERS)
+    # cbilling Native API
+    elif provider == 'cbilling':
+        epgUrl = Request('http://%s/epg/%s?date=' % ('api.' + '.'.join(parsed_url.hostname.split('.')[1:]),
+                          splittedpath[2] if 'static' in splittedpath else splittedpath[1] if 'token' in parsed_url.query else splittedpath[-1].split('.')[0]), headers=HEADERS) 
+    # tv.team Native API
+    elif provider == 'tvteam':
+        epgUrl = Request('http://tv.team/%s.json' % (splittedpath[-2] if not 'static' in splittedpath else splittedpath[-1]), headers=HEADERS)
+    # For e2m3u2b compatibility with shara.club & ipstream used Native API
+    elif provider in ('shara.club', 'ipstream') and 'sapp_tvgid' in params:
+        data = urlencode({'type': 'epg',
+                          'ch'  : params['sapp_tvgid'], }).encode('utf-8')
+        epgUrl = Request('%s://%s/get/' % (parsed_url.scheme, 'api.' + '.'.join(parsed_url.hostname.split('.')[1:])), data, HEADERS)
+    # For e2m3u2b compatibility with OTT-play FOSS EPG
+    elif provider in OTTP_EPG_PROVIDERS and 'sapp_tvgid' in params:
+        epgUrl = Request(epgIndex.get(url)[2], headers=HEADERS)
+    # The rest for compatibility if we do not use e2m3u2b and there is no tvg-id.
+    # We are looking for by name in EPG in OTT-play by Alex
+    else:
+        # TODO: Адаптировать
+        # epgUrl = Request('http://epg.ott-play.com/m3u/ge2.php', urlencode({'channel': chName}).encode('utf-8'), HEADERS)
+        log.info('%s ch: %s no EPG source', provider, chName)
+        return provider, days, None
+    latency.record(provider, 'resolve', resolved - start)
+    latency.record(provider, 'request', timer() - resolved)
+    return provider, days, epgUrl
+
+
+def loadArchive(epgRequest, provider, days, chName='', mirror=None, cancel=None):
+    """
+    Downloads and parses the EPG archive of the channel, hedged with the mirror request if it's given.
+    The same archive requested from several threads is downloaded only once.
+    Blocking, so it's intended to be run through ThreadedCall. cancel is CancelToken of the download or None
+    """
+    if mirror is not None:
+        return loadArchiveHedged(epgRequest, mirror, provider, days, chName, cancel)
+    if provider in DATE_PAGED_APIS:
+        return loadArchiveByDays(epgRequest, provider, days, chName, cancel)
+    key = epgCache.makeKey(provider, epgRequest.get_full_url(), epgRequest.data or '')
+    return inFlight.do(key, downloadArchive, epgRequest, provider, days, key, chName, cancel)
+
+def loadArchiveHedged(epgRequest, mirror, provider, days, chName='', cancel=None):
+    """
+    Requests the archive from the native API and OTT-play FOSS EPG mirror: the source with the better record
+    in sourceStats goes first, the other one is started when the first fails or doesn't answer in HEDGE_DELAY seconds.
+    The first parsed archive wins, the download of the other source is cancelled.
+    Raises the error of the first source if both fail, Cancelled if cancel is cancelled
+    """
+    sources = {'native': (epgRequest, provider), OTTP_MIRROR: (mirror, OTTP_MIRROR)}
+    order = sourceStats.order(provider, ('native', OTTP_MIRROR))
+    tokens = dict((source, CancelToken(cancel)) for source in order)
+    results = {}        # source -> EventStore or exc_info
+    answered = ThreadEvent()
+    lock = Lock()
+
+    def fetch(source):
+        request, sourceProvider = sources[source]
+        start = timer()
+        try:
+            result = loadArchive(request, sourceProvider, days, chName, cancel=tokens[source])
+        except Cancelled:
+            if source == order[0] and not (cancel and cancel.cancelled):  # lost to the hedge, it would take longer than that
+                sourceStats.record(provider, source, timer() - start, True, False)
+            answered.set()
+            return
+        except:
+            result = sys.exc_info()
+        ok = isinstance(result, EventStore)
+        with lock:
+            won = ok and not any(isinstance(r, EventStore) for r in results.values())
+            results[source] = result
+        sourceStats.record(provider, source, timer() - start, ok, won)
+        answered.set()
+
+    def start(source):
+        worker = Thread(target=fetch, args=(source,))
+        worker.daemon = True
+        worker.start()
+
+    start(order[0])
+    answered.wait(HEDGE_DELAY)
+    hedged = False
+    while True:
+        if cancel is not None:
+            cancel.check()
+        with lock:
+            winners = [s for s in order if isinstance(results.get(s), EventStore)]
+            if winners:
+                for source in order:
+                    if source != winners[0]:
+                        tokens[source].cancel()
+                return results[winners[0]]
+            if len(results) == len(order):
+                raise results[order[0]][1]
+            answered.clear()
+        if not hedged:  # the first source failed or is late
+            hedged = True
+            start(order[1])
+        answered.wait()
+
+def getDayRequest(epgRequest, param, day):
+    """
+    The request with the query parameter param set to day
+    """
+    parsed_url = urlparse(epgRequest.get_full_url())
+    query = [(k, v) for k, v in parse_qsl(parsed_url.query, True) if k != param] + [(param, day)]
+    return Request(parsed_url._replace(query=urlencode(query)).geturl(), epgRequest.data, dict(epgRequest.header_items()))
+
+def loadArchiveByDays(epgRequest, provider, days, chName='', cancel=None):
+    """
+    Loads the archive of the date-paginated API by days, from today back to the depth of archive,
+    DAY_FETCH_WORKERS days at once, and merges the sorted days into one EventStore, newest first.
+    Every day is cached on its own. The days failed to load are left out unless all of them fail
+    """
+    param, dayFormat = DATE_PAGED_APIS[provider]
+    now = time.time()
+    pending = deque(enumerate([getDayRequest(epgRequest, param, time.strftime(dayFormat, time.localtime(now - d * 86400)))
+                               for d in range(days + 1)]))
+    results = [None] * len(pending)     # EventStore or exc_info of the day
+    lock = Lock()
+
+    def fetch():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                i, request = pending.popleft()
+            key = epgCache.makeKey(provider, request.get_full_url(), request.data or '')
+            try:
+                results[i] = inFlight.do(key, downloadArchive, request, provider, days, key, chName, cancel)
+            except NoArchiveError:
+                results[i] = EventStore()
+            except:
+                results[i] = sys.exc_info()
+
+    workers = [Thread(target=fetch) for i in range(min(DAY_FETCH_WORKERS, len(pending)) - 1)]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    fetch()
+    for worker in workers:
+        worker.join()
+
+    stores = [r for r in results if isinstance(r, EventStore)]
+    failed = [r for r in results if not isinstance(r, EventStore)]
+    if not stores:
+        raise failed[0][1]
+    if failed:
+        log.warning('%s ch: %s %d of %d days failed to load: %s', provider, chName, len(failed), len(results), failed[0][1])
+    if not any(stores):
+        raise NoArchiveError()
+    return EventStore.merge(stores)
+
+def downloadArchive(epgRequest, provider, days, key, chName, cancel=None):
+    """
+    The payload is taken from epgCache while it's fresh.
+    The expired payload is revalidated with a conditional request if the server gave ETag or Last-Modified,
+    it's served stale if the server is unreachable, fails with 5xx or its circuit is open.
+    The response is decompressed and parsed by chunks as it arrives
+    """
+    entry = epgCache.open(provider, key)
+    try:
+        if entry is not None and entry.fresh:
+            log.debug('%s ch: %s epgUrl (cached): %s', provider, chName, epgRequest.get_full_url())
+            try:
+                events = readArchive(entry.f, provider, days)
+                epgCache.count('hit')
+                return events
+            except Exception: # damaged entry, download it again
+                epgCache.remove(key)
+                entry.close()
+                entry = None
+
+        try:
+            resp = httpPool.urlopen(epgRequest, entry.conditionalHeaders() if entry else None, cancel)
+        except URLError as e:
+            if entry is None or isinstance(e, HTTPError) and e.code < 500:
+                raise
+            log.info('%s ch: %s epgUrl (stale, %s): %s', provider, chName, e, epgRequest.get_full_url())
+            try:
+                events = readArchive(entry.f, provider, days)
+            except Exception:
+                epgCache.remove(key)
+                raise e
+            epgCache.count('stale')
+            return events
+        if resp.status == 304 and entry is not None:
+            resp.close()
+            log.debug('%s ch: %s epgUrl (not modified): %s', provider, chName, epgRequest.get_full_url())
+            try:
+                events = readArchive(entry.f, provider, days)
+            except Exception:
+                epgCache.remove(key)
+                raise
+            epgCache.renew(key)
+            epgCache.count('revalidated')
+            return events
+    finally:
+        if entry is not None:
+            entry.close()
+
+    if resp.connectTime is not None:
+        latency.record(provider, 'connect', resp.connectTime)
+    latency.record(provider, 'ttfb', resp.ttfb)
+    writer = epgCache.writer(key, resp.getheader('ETag'), resp.getheader('Last-Modified'))
+    try:
+        log.debug('%s ch: %s epgUrl: %s', provider, chName, resp.geturl())
+        wbits = {'deflate': -zlib.MAX_WBITS, 'gzip': zlib.MAX_WBITS|16}.get(resp.info().get('Content-Encoding'))
+        decompressor = zlib.decompressobj(wbits) if wbits else None
+        parser = getArchiveParser(provider, days)
+        start = timer()
+        decompressTime = parseTime = 0.0
+        for chunk in iter(lambda: resp.read(CHUNK_SIZE), b''):
+            if decompressor:
+                t = timer()
+                chunk = decompressor.decompress(chunk)
+                decompressTime += timer() - t
+            t = timer()
+            parser.feed(chunk)
+            parseTime += timer() - t
+            writer.write(chunk)
+        if decompressor:
+            chunk = decompressor.flush()
+            parser.feed(chunk)
+            writer.write(chunk)
+        latency.record(provider, 'download', timer() - start)
+        if decompressor:
+            latency.record(provider, 'decompress', decompressTime)
+        latency.record(provider, 'parse', parseTime)
+        with latency.span(provider, 'sort'):
+            events = parser.close()
+    except:
+        writer.abort()
+        raise
+    finally:
+        resp.close()
+    writer.commit()
+    epgCache.count('download')
+    return events
+
+def readArchive(f, provider, days):
+    parser = getArchiveParser(provider, days)
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+        parser.feed(chunk)
+    return parser.close()
+
+
+class ThreadedCall(object):
+    """
+    Runs fnc(*args) in a worker thread and returns its outcome to the enigma2 main loop:
+    the eTimer polls the worker and calls callback(result) or errback(sys.exc_info()) in the GUI thread.
+    The outcome of the cancelled call is dropped, its CancelToken aborts the downloads of fnc.
+    """
+    POLL_INTERVAL = 50 # ms
+
+    def __init__(self, fnc, args, callback, errback, cancelToken=None):
+        self.callback = callback
+        self.errback = errback
+        self.cancelToken = cancelToken
+        self.outcome = None
+        self.cancelled = False
+        self.pollTimer = eTimer()
+        try: # For DreamOS
+            self.timer_conn = self.pollTimer.timeout.connect(self.poll)
+        except:
+            self.pollTimer.callback.append(self.poll)
+        worker = Thread(target=self.run, args=(fnc, args))
+        worker.daemon = True
+        worker.start()
+        self.pollTimer.start(self.POLL_INTERVAL, False)
+
+    def run(self, fnc, args):
+        try:
+            self.outcome = (True, fnc(*args))
+        except:
+            self.outcome = (False, sys.exc_info())
+
+    def poll(self):
+        if self.outcome is None:
+            return
+        self.pollTimer.stop()
+        if not self.cancelled:
+            ok, result = self.outcome
+            (self.callback if ok else self.errback)(result)
+
+    def cancel(self):
+        self.cancelled = True
+        self.pollTimer.stop()
+        if self.cancelToken is not None:
+            self.cancelToken.cancel()
+
+
+class SingleFlight(object):
+    """
+    Collapses the concurrent calls with the same key into one:
+    the first caller runs fnc, the others wait and share its result or exception.
+    If the call of the first one is cancelled, the others run it again
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.calls = {}     # key -> [ThreadEvent, result, exc_info]
+
+    def do(self, key, fnc, *args):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = [ThreadEvent(), None, None]
+        if leader:
+            try:
+                call[1] = fnc(*args)
+            except:
+                call[2] = sys.exc_info()
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call[0].set()
+        else:
+            call[0].wait()
+        if call[2]:
+            if not leader and issubclass(call[2][0], Cancelled):
+                return self.do(key, fnc, *args)
+            raise call[2][1]
+        return call[1]
+
+inFlight = SingleFlight()
+
+
+class ArchivePrefetcher(object):
+    """
+    Warms archiveLists with the archives of the channels the user is likely to open next.
+    Up to maxWorkers downloads run at once, a new prefetch() or cancel() drops the queued jobs
+    """
+
+    def __init__(self, maxWorkers=PREFETCH_WORKERS):
+        self.maxWorkers = maxWorkers
+        self.workers = 0
+        self.jobs = deque()     # (serviceKey, provider, days, Request, chName, mirror Request)
+        self.lock = Lock()
+
+    def prefetch(self, jobs):
+        with self.lock:
+            self.jobs.clear()
+            self.jobs.extend(jobs)
+            while self.workers < min(self.maxWorkers, len(self.jobs)):
+                self.workers += 1
+                worker = Thread(target=self.run)
+                worker.daemon = True
+                worker.start()
+
+    def cancel(self):
+        with self.lock:
+            self.jobs.clear()
+
+    def run(self):
+        while True:
+            with self.lock:
+                if not self.jobs:
+                    self.workers -= 1
+                    return
+                serviceKey, provider, days, epgRequest, chName, mirror = self.jobs.popleft()
+            if serviceKey in archiveLists:
+                continue
+            try:
+                archiveLists.put(provider, serviceKey, loadArchive(epgRequest, provider, days, chName, mirror))
+            except:
+                log.info('Prefetch failed: %s ch: %s (%s)', provider, chName, sys.exc_info()[1])
+
+archivePrefetcher = ArchivePrefetcher()
+
+
+def getArchiveJob(serviceKey):
+    """
+    Builds the archive loading job (serviceKey, provider, days, Request, chName, mirror Request) like onCreate does,
+    None if the service has no archive
+    """
+    service = ServiceReference(serviceKey)
+    url = service.getPath()
+    if not url:
+        return None
+    chName = service.getServiceName().replace(SIGN, '')
+    try:
+        provider, days, epgRequest = getEpgRequest(url, chName)
+    except:
+        return None
+    return (serviceKey, provider, days, epgRequest, chName, getMirrorRequest(url, provider)) if epgRequest else None
+
+
+class WarmupScheduler(object):
+    """
+    Refreshes archiveLists of the favourite channels (file of service references, one per line)
+    and the most opened ones while the box is in standby or the plugin isn't used.
+    Runs every WARMUP_INTERVAL seconds, up to WARMUP_WORKERS downloads at once and only while
+    the EPG traffic of the last hour is below WARMUP_TRAFFIC. A failed channel is retried
+    after WARMUP_BACKOFF[0] seconds, the delay doubles on every failure up to WARMUP_BACKOFF[1].
+    The changed opening counts are written at most every WARMUP_SAVE_INTERVAL seconds
+    """
+
+    def __init__(self, favouritesFile, opensFile):
+        self.favouritesFile = favouritesFile
+        self.opensFile = opensFile
+        self.opens = None       # serviceKey -> number of the archive openings, loaded on start()
+        self.opensChanged = False
+        self.opensSaved = 0     # time of the last write of opensFile
+        self.failures = {}      # serviceKey -> (number of failures, time of the next try)
+        self.loaders = {}       # serviceKey -> ThreadedCall
+        self.traffic = deque()  # (time, httpPool.received) of the last hour
+        self.paused = 0         # number of the open plugin screens
+        self.timer = None
+
+    def start(self):
+        if self.timer or not WARMUP_CHANNELS:
+            return
+        self.loadOpens()
+        self.timer = eTimer()
+        try: # For DreamOS
+            self.timer_conn = self.timer.timeout.connect(self.run)
+        except:
+            self.timer.callback.append(self.run)
+        self.timer.start(WARMUP_INTERVAL * 1000, False)
+
+    def pause(self):
+        self.paused += 1
+
+    def resume(self):
+        self.paused = max(self.paused - 1, 0)
+        self.saveOpens()
+
+    def opened(self, serviceKey):
+        if self.opens is not None:
+            self.opens[serviceKey] = self.opens.get(serviceKey, 0) + 1
+            self.opensChanged = True
+
+    def loadOpens(self):
+        try:
+            with open(self.opensFile) as f:
+                self.opens = dict((k if PY3 else k.encode('utf-8'), v) for k, v in json.load(f).items())
+        except (IOError, OSError, ValueError, AttributeError):
+            self.opens = {}
+
+    def saveOpens(self):
+        if not self.opensChanged or time.time() - self.opensSaved < WARMUP_SAVE_INTERVAL:
+            return
+        top = sorted(self.opens.items(), key=lambda x: x[1], reverse=True)[:200]
+        self.opensChanged = False
+        self.opensSaved = time.time()
+        try:
+            with open(self.opensFile, 'w') as f:
+                json.dump(dict(top), f)
+        except (IOError, OSError):
+            pass
+
+    def isIdle(self):
+        try:
+            from Screens.Standby import inStandby
+        except ImportError:
+            inStandby = None
+        return bool(inStandby) or not self.paused
+
+    def channels(self):
+        """
+        The favourites in the file order, then the most opened channels
+        """
+        keys = []
+        try:
+            with open(self.favouritesFile) as f:
+                keys = [l.strip() for l in f if l.strip() and not l.startswith('#')]
+        except (IOError, OSError):
+            pass
+        keys += [k for k, n in sorted(self.opens.items(), key=lambda x: x[1], reverse=True) if k not in keys]
+        return keys[:WARMUP_CHANNELS]
+
+    def overBudget(self):
+        now = time.time()
+        self.traffic.append((now, httpPool.received))
+        while now - self.traffic[0][0] > 3600:
+            self.traffic.popleft()
+        return httpPool.received - self.traffic[0][1] >= WARMUP_TRAFFIC
+
+    def run(self):
+        self.saveOpens()    # the counts left by the throttle
+        if self.overBudget() or not self.isIdle():
+            return
+        now = time.time()
+        for serviceKey in self.channels():
+            if len(self.loaders) >= WARMUP_WORKERS:
+                break
+            if serviceKey in self.loaders or serviceKey in archiveLists or self.failures.get(serviceKey, (0, 0))[1] > now:
+                continue
+            job = getArchiveJob(serviceKey)
+            if job is None:
+                continue
+            serviceKey, provider, days, epgRequest, chName, mirror = job
+            self.loaders[serviceKey] = ThreadedCall(loadArchive, (epgRequest, provider, days, chName, mirror),
+                                                    lambda events, job=job: self.loaded(job, events),
+                                                    lambda exc_info, job=job: self.failed(job, exc_info))
+
+    def loaded(self, job, events):
+        del self.loaders[job[0]]
+        self.failures.pop(job[0], None)
+        archiveLists.put(job[1], job[0], events)
+
+    def failed(self, job, exc_info):
+        del self.loaders[job[0]]
+        failures = self.failures.get(job[0], (0, 0))[0] + 1
+        self.failures[job[0]] = (failures, time.time() + min(WARMUP_BACKOFF[0] * 2 ** (failures - 1), WARMUP_BACKOFF[1]))
+        log.info('Warm-up failed: %s ch: %s (%s)', job[1], job[4], exc_info[1])
+
+STATE_PATH = BOUQUETS_PATH or tempfile.gettempdir()   # files of the plugin state kept between sessions
+warmupScheduler = WarmupScheduler(os.path.join(STATE_PATH, 'iptvarchive.favourites'), os.path.join(STATE_PATH, 'iptvarchive.opens'))
+hostHealth = HostHealth(os.path.join(STATE_PATH, 'iptvarchive.health'), maxTimeout=httpPool.timeout)   # timeouts and circuits of EPG hosts
+hostHealth.load()
+httpPool.health = hostHealth
+
+
+class IPTVArchiveEventViewEPGSelect(EventViewEPGSelect):
+    def __init__(self, session, event, ref, callback=None, singleEPGCB=None, multiEPGCB=None, similarEPGCB=None):
+        Screen.__init__(self, session)
+        self.skinName = ['iptvArchiveEventView', 'EventView']
+        EventViewBase.__init__(self, event, ref, callback, similarEPGCB)
+        self["key_red"] = Button('')
+        self["key_green"] = Button('')
+        self["key_yellow"] = Button('')
+        self["key_blue"] = Button('')
+
+        self["setupActions"] = ActionMap(["ColorActions"],
+           {
+               "cancel": self.cancel,
+               "red": self.cancel,
+               "green":self.cancel,
+               "yellow": self.cancel,
+            }, -2)
+
+    def cancel(self):
+        self.close(True)
+
+
+class iptvArchiveSelection(EPGSelection):
+    __module__ = __name__
+    loader = None   # ThreadedCall of the pending EPG request
+    events = None   # EventStore of the channel archive
+    chName = ''     # name of the current channel, set by onCreate
+
+    def __init__(self, session, service=None):
+        log.info('IPTV Archive v%s :: Image: %s', __version__, boxInfo()['imagever'])
+
+        if paramExist(EPGSelection.__init__, 'EPGtype'):
+            EPGSelection.__init__(self, session, service, EPGtype='single')
+        else:
+            EPGSelection.__init__(self, session, service)
+        self.service = service
+        self.currentService = ServiceReference(service)
+        self.oldService = self.session.nav.getCurrentlyPlayingServiceReference()
+        self.noTMBD = _("The TMBD plugin is not installed!\nPlease install it.")
+        self.skinName = ["iptvArchiveEPGSelection", "EPGSelection"]
+        blueK = ''
+        if boxInfo()['imagever'] != 'openpli': # No OpenPli !!!
+            self["key_red"].setText('')
+            self["key_yellow"].setText('')
+            self["key_blue"].setText(_('Channel Selection'))
+            blueK = "blue"
+
+        self["key_red"].setText(_('TMBD Search'))
+        self["key_green"].setText(_('Fake Events'))
+        self["key_yellow"].setText(_('Gluing titles'))
+        self["Service"].newService(self.service)
+
+        self["setupActions"] = ActionMap(["ColorActions", "EPGSelectActions", "SetupActions"],
+            {
+               "cancel": self.cancel,
+               "red": self.searchTMDB,
+               "green":self.toggleFakeEvents,
+               "yellow": self.toggleGlueTitles,
+               "info": self.infoKeyPressed,
+               blueK: self.blueButtonPressedNoPLi,
+            }, -2)
+
+        self.onClose.append(self.__onClose)
+        warmupScheduler.pause()
+
+        hotKey = getHotKey()    # iptvArchiveInfoBar binds iptvHotKey
+        log.debug('iptvHotKey: %s', hotKey)
+
+    def __onClose(self):
+        self.cancelLoading()
+        archivePrefetcher.cancel()
+        warmupScheduler.resume()
+        exportStatistics()
+        hostHealth.save()
+        httpPool.clear()
+        self.session.nav.playService(self.oldService)
+        InfoBar.instance.doShow()
+
+    def cancel(self):
+        cs = self.session.nav.getCurrentlyPlayingServiceReference()
+        self.showInfoBar() if cs and cs != self.oldService else self.close(True)
+
+    def OK(self): # for OpenATV
+        self.eventSelected()
+
+    def searchTMDB(self):
+       try:
+            from Plugins.Extensions.TMBD.plugin import TMBD
+            cs = self["list"].l.getCurrentSelection()
+            if not (cs and cs[3]):
+                return
+            yr = [ _y for _y in re.findall(r'\d{4}', cs[0]) if '1930' <= _y <= '%s' % time.gmtime().tm_year ]
+            self.session.open(TMBD, cs[4], yr[-1] if yr else None)
+       except ImportError:
+            self.session.open(MessageBox, self.noTMBD, type=MessageBox.TYPE_INFO, timeout=10)
+
+    def eventSelected(self):
+        global myStartTime
+        global myDuration
+        global myTimeStamp
+        cs = self["list"].l.getCurrentSelection()
+        if cs and cs[3]:              # duration != 0 ))
+            myStartTime = cs[2]       # save startTime
+            myDuration = cs[3]        # save duration
+            myTimeStamp = currTime()  # get timestamp
+            newRef = eServiceReference(str(self.currentService))
+            with latency.span(self.provider, 'archiveUrl'):
+                newRef.setPath(getArchiveUrl(newRef.getPath(), self.currentService.getServiceName().replace('® ' if PY3 else u'® '.encode('utf-8'), '')))
+            with latency.span(self.provider, 'playService'):
+                self.session.nav.playService(newRef)
+            self.playedEvent = epgEvent(*cs)
+            self.showInfoBar()
+
+    def showInfoBar(self):
+        self.hide()
+        self.session.openWithCallback(lambda *args: self.close(True) if args else self.show(), iptvArchiveInfoBar, self.playedEvent, self.events)
+
+    def onSelectionChanged(self):
+        cs = self["list"].l.getCurrentSelection()
+        if cs: self['Event'].newEvent(epgEvent(*cs))
+
+    def infoKeyPressed(self):
+        cs = self["list"].l.getCurrentSelection()
+        if cs: self.session.open(IPTVArchiveEventViewEPGSelect, epgEvent(*cs), self.currentService)
+
+    def setService(self, service):
+        self.currentService = service
+        self.service = eServiceReference(str(service))
+        self.onCreate()
+
+    def channelSelectionCallback(self, *args):
+        if args:
+            try:
+                serviceref, bouquetref = args[:2]
+                self.parent = self
+                self.parent.epg_bouquet = bouquetref
+            except:
+                serviceref = args[0]
+            finally:
+                self.setService(ServiceReference(serviceref))
+
+    def blueButtonPressedNoPLi(self):
+        if paramExist(SimpleChannelSelection.__init__, 'currentBouquet'):
+            self.session.openWithCallback(self.channelSelectionCallback, SimpleChannelSelection, _("Channel Selection"), currentBouquet=True,)
+        else:
+            self.session.openWithCallback(self.channelSelectionCallback, SimpleChannelSelection, _("Channel Selection"))
+
+    def toggleFakeEvents(self):
+        if self["key_green"].getText() == _('Fake Events'):
+            self["key_red"].setText("")
+            self["key_green"].setText('EPG')
+            self["key_yellow"].setText('')
+            self.cancelLoading()
+            self.fakeArchiveListLoaded()
+        else:
+            self["key_red"].setText(_('TMBD Search'))
+            self["key_green"].setText(_('Fake Events'))
+            self["key_yellow"].setText(_('Gluing titles'))
+            self.onCreate()
+
+    def toggleGlueTitles(self):
+        if self["key_yellow"].getText() == _('Gluing titles'):
+            self["key_green"].setText('')
+            self["key_yellow"].setText('EPG')
+            self.cancelLoading()
+            self.GlueTitle()
+        else:
+            self["key_yellow"].setText(_('Gluing titles'))
+            self["key_green"].setText(_('Fake Events'))
+            self.onCreate()
+
+    def GlueTitle(self):
+        self["list"].recalcEntrySize()
+        if self.provider is None:
+            self.list1item(_("No access to archive"), _("Not IPTV Channel. No access to archive") if not self.currentService.getPath() else _("Unknown IPTV provider. No access to archive"))
+            return
+
+        l = self["list"]
+        l.list = glueTitles(l.list, GLUE_SERIES)
+        l.l.setList(l.list)
+        l.selectionChanged()
+
+    def fakeArchiveListLoaded(self):
+        self["list"].recalcEntrySize()
+        if self.provider is None:
+            self.list1item(_("No access to archive"), _("Not IPTV Channel. No access to archive") if not self.currentService.getPath() else _("Unknown IPTV provider. No access to archive"))
+            return
+
+        l = self["list"]
+        l.list = []
+        li = self["list"].list
+        start = (currTime()/3600)*3600
+        while (start > currTime() - (self.days * 24 * 3600)):
+            li.append((_('Fake EPG'), int(start), int(start), 3600, time.strftime("%A, %d.%m, %H:%M",time.localtime(start))))
+            start -= 3600
+        l.l.setList(l.list)
+        l.selectionChanged()
+
+    def archiveListDownloaded(self, events):
+        archiveLists.put(self.provider, self.serviceKey, events)
+        self.archiveListLoaded(events)
+
+    def archiveListLoaded(self, events):
+        self.events = events
+        if len(events):
+            l = self["list"]
+            with latency.span(self.provider, 'setList'):
+                l.list = events.rows()
+                l.l.setList(l.list)
+                l.selectionChanged()
+            latency.record(self.provider, 'open', timer() - self.openStart)
+        else:
+            self.list1item(_("No archive"), _("There are no archive entries for this channel satisfying the conditions of a given search depth"))
+        self.prefetchNeighbours()
+
+    def prefetchNeighbours(self):
+        """
+        Queues the archives of PREFETCH_NEIGHBOURS channels before and after the current one in the bouquet
+        """
+        try:
+            bouquet = getattr(self, 'epg_bouquet', None) or InfoBar.instance.servicelist.getRoot()
+            services = [x for x in eServiceCenter.getInstance().list(bouquet).getContent('S', False) if ServiceReference(x).getPath()]
+            idx = services.index(self.serviceKey)
+        except:
+            return
+        jobs = []
+        for d in range(1, PREFETCH_NEIGHBOURS + 1):
+            for x in (services[(idx + d) % len(services)], services[(idx - d) % len(services)]):
+                if x == self.serviceKey or x in archiveLists or x in [j[0] for j in jobs]:
+                    continue
+                job = getArchiveJob(x)
+                if job:
+                    jobs.append(job)
+        archivePrefetcher.prefetch(jobs)
+
+    def archiveListFailed(self, exc_info):
+        if issubclass(exc_info[0], URLError):
+            self.list1item(_("Error getting archive"), _("Can't download the EPG data.\nFailed to reach a server or the API server couldn't fulfill the request"))
+            e = exc_info[1]
+            log.warning('%s ch: %s APIurl: %s Error: %s', self.provider, self.chName, self.epgRequest.get_full_url(), e.reason if hasattr(e, 'reason') else e.code)
+        elif issubclass(exc_info[0], NoArchiveError):
+            self.list1item(_("No archive"), _("There are no archive entries for this channel"))
+        else:
+            self.list1item(_("No archive"), _("EPG data parsing error"))
+            log.exception('%s ch: %s EPG data parsing error', self.provider, self.chName, exc_info=exc_info)
+
+    def cancelLoading(self):
+        if self.loader:
+            self.loader.cancel()
+            self.loader = None
+
+    def onCreate(self, firstrun=False):
+        self.cancelLoading()
+        self.events = None
+        self.openStart = timer()
+        try:
+            self["list"].recalcEntrySize()
+            if boxInfo()['imagever'] == 'openbh' and not HardwareInfo().is_nextgen():  # OpenBH !!!
+                self.createTimer.stop()
+            service = self.currentService
+            self.chName = chName = service.getServiceName().replace(SIGN, '')
+            url = service.getPath()
+            self["Service"].newService(service.ref)
+            self.setTitle(_("IPTV Archive") + ' - ' + chName)
+
+            if not url: # DVB
+                self.list1item(_("No access to archive"), _("Not IPTV Channel. No access to archive"))
+                self.provider, self.days = None, 0
+                return
+            self.provider, self.days, epgUrl = getEpgRequest(url, chName)
+            if self.provider is None:
+                self.list1item(_("No access to archive"), _("Unknown IPTV provider. No access to archive"))
+                return
+            if epgUrl is None:
+                self.list1item(_("No access to archive"), _("No EPG source of the IPTV provider. No access to archive"))
+                return
+            self.epgRequest = epgUrl
+            self.serviceKey = str(service)
+            warmupScheduler.opened(self.serviceKey)
+            events = archiveLists.get(self.serviceKey)
+            if events is not None:
+                self.archiveListLoaded(events)
+                return
+            self.list1item(_("Wait ..."), _("Wait for load archive..."))
+            cancel = CancelToken()  # a new channel or the close aborts the download
+            self.loader = ThreadedCall(loadArchive, (epgUrl, self.provider, self.days, chName, getMirrorRequest(url, self.provider), cancel),
+                                       self.archiveListDownloaded, self.archiveListFailed, cancel)
+        except:
+            self.list1item(_("Error getting archive"), _("Error generating request URL for receiving EPG archive broadcasts"))
+            log.exception('ch: %s request URL error', self.chName)
+
+    def list1item(self, title='', descr=''):
+        btime = currTime()
+        self["list"].list = []
+        self["list"].l.setList(self["list"].list)
+        self['Event'].newEvent(epgEvent(descr, btime, btime, 0, title))
+        self["list"].selectionChanged()
+
+
+class epgEvent(object):
+    __slots__ = ('descr', 'eventid', 'btime', 'duration', 'title')
+
+    def __init__(self, descr, eventid, btime, duration, title):
+        """
+        Set broadcast EPG info for current selection, the arguments are the row of the list
+        0 -> short description
+        1 -> eventid
+        2 -> begin time
+        3 -> duration time
+        4 -> title
+        """
+        self.descr = descr if descr != '' else _("Description not available")
+        self.eventid = eventid or btime
+        self.btime = btime
+        self.duration = duration
+        self.title = title
+
+    def getEventName(self): return self.title
+    def getShortDescription(self): return self.descr
+    def getExtendedDescription(self): return ''
+    def getBeginTime(self): return self.btime
+    def getDuration(self): return self.duration
+    def getBeginTimeString(self): return time.strftime("%d.%m, %H:%M", time.localtime(self.btime))
+    def getEventId(self): return self.eventid
+    def getGenreData(self): return None
+    def getParentalData(self): return None
+    def getGenreDataList(self): return None
+    def getPdcPil(self): return 0
+    def getRunningStatus(self): return 4
+    def getArchiveBeginTimeString(self):
+        return _('Archive for') + time.strftime(' {%w}, %d %B %Y', time.localtime(self.btime)).format(*[ _('sunday'),
+                                                                                                         _('monday'),
+                                                                                                         _('tuesday'),
+                                                                                                         _('wednesday'),
+                                                                                                         _('thursday'),
+                                                                                                         _('friday'),
+                                                                                                         _('saturday'),
+                                                                                                       ])
+
+
+class iptvArchiveSecondInfoBar(Screen):
+    def __init__(self, session):
+        Screen.__init__(self, session)
+        self.skinName = ['iptvArchiveSecondInfoBar', 'SecondInfoBar']
+        self["OkCancelActions"] = HelpableActionMap(self, "OkCancelActions",
+            {
+                "ok": self.close,
+                "cancel": self.close,
+            }, -2)
+
+class iptvArchiveInfoBar(Screen, InfoBarAudioSelection, InfoBarNotifications, InfoBarSubtitleSupport, InfoBarMenu):
+    STATE_HIDDEN = 0
+    STATE_SHOWN = 1
+
+    def __init__(self, session, ev, events=None):
+        Screen.__init__(self, session)
+        for x in InfoBarAudioSelection, InfoBarNotifications, InfoBarSubtitleSupport, InfoBarMenu:
+            x.__init__(self)
+        self.skinName = ['iptvArchiveInfoBar', 'InfoBar']
+        self.skinAttributes = None
+        self.session.screen['Event_Now'] = Event()
+        self.session.screen['Event_Next'] = Event()
+        self.strRef = str(ServiceReference(self.session.nav.getCurrentlyPlayingServiceReference()))
+        self.ev = ev
+        self.events = events    # EventStore to follow the played position across the events
+        self.hideTimer = eTimer()
+        self.eventTimer = eTimer()  # fires at the end of the played event
+        try: # For DreamOS
+            self.timer_conn = self.hideTimer.timeout.connect(self.doTimerHide)
+            self.event_timer_conn = self.eventTimer.timeout.connect(self.updateEvent)
+        except:
+            self.hideTimer.callback.append(self.doTimerHide)
+            self.eventTimer.callback.append(self.updateEvent)
+
+        self["setupActions"] = ActionMap([ "MediaPlayerActions", "HotkeyActions", "InfobarSeekActions", "SetupActions",],
+            {
+                "ok": self.ok,
+                "cancel": self.cancel,
+                "info": self.close,
+                "epg": self.close,
+                iptvHotKey: self.close,
+                "pause": self.pause,
+                "play": self.pause,
+                "stop": self.stop,
+                "1": lambda: self.myjump(1),
+                "3": lambda: self.myjump(3),
+                "4": lambda: self.myjump(4),
+                "6": lambda: self.myjump(6),
+                "7": lambda: self.myjump(7),
+                "9": lambda: self.myjump(9),
+                "5": self.jumpToTime,
+                "seekBack": lambda: self.myjump(7),
+                "seekFwd": lambda: self.myjump(9),
+            }, -2)
+
+        # BH image reqirements
+        self["HbbtvApplication"] = Boolean(fixed=0)
+        self["HbbtvApplication"].name = ""
+        # VTI image reqirements
+        self["KeyRedText"] = Boolean(fixed=0)
+        self["KeyRedText"].name = ""
+        self["KeyGreenText"] = Boolean(fixed=0)
+        self["KeyGreenText"].name = ""
+        self["KeyYellowText"] = Boolean(fixed=0)
+        self["KeyYellowText"].name = ""
+        self["KeyBlueText"] = Boolean(fixed=0)
+        self["KeyBlueText"].name = ""
+        # end VTI
+        self.onClose.append(self.__onClose)
+        self.updateEvent()
+        self.doShow()
+
+    def __onClose(self):
+        global myStartTime
+        global myTimeStamp
+        self.eventTimer.stop()
+        myStartTime = myStartTime + currTime() - myTimeStamp
+        myTimeStamp = currTime()
+
+    def ok(self):
+        global myTimeStamp
+        if myTimeStamp > 0: # not paused
+            if self.__state == self.STATE_SHOWN:
+                self.__state = self.STATE_HIDDEN
+                self.hide()
+                self.session.open(iptvArchiveSecondInfoBar)
+            else:
+                self.doShow()
+        else:
+            self.myjump(0)
+
+    def doShow(self):
+        self.__state = self.STATE_SHOWN
+        self.show()
+        self.startHideTimer()
+
+    def doTimerHide(self):
+        self.hideTimer.stop()
+        self.__state = self.STATE_HIDDEN
+        self.hide()
+
+    def startHideTimer(self):
+        if self.__state == self.STATE_SHOWN:
+            idx = config.usage.infobar_timeout.index
+            if idx:
+                self.hideTimer.start(idx * 1000, True)
+
+    def pause(self):
+        global myTimeStamp
+        if myTimeStamp > 0: # not paused
+            self.session.nav.stopService()
+            global myStartTime
+            myStartTime = myStartTime + currTime() - myTimeStamp  # calculate new archive startTime
+            myTimeStamp = 0
+            self.updateEvent()
+            self.doShow()
+        else:
+            self.myjump(0)
+
+    def stop(self, value=True):
+        if value:
+            self.close(True)
+
+    def cancel(self):
+        if paramExist(MessageBox.__init__, 'title'):
+            self.session.openWithCallback(self.stop, MessageBox, _("%s\n\nStop playback and exit plugin?") %  self.ev.getEventName(),
+                                                                      timeout=10, default=True, title=self.strRef.split(':')[-1])
+        else:
+            self.session.openWithCallback(self.stop, MessageBox, _("%s\n\nStop playback and exit plugin?") %  self.ev.getEventName(),
+                                                                      timeout=10, default=True)
+
+    def position(self):
+        """
+        The archive time being played now
+        """
+        return myStartTime + currTime() - myTimeStamp if myTimeStamp > 0 else myStartTime
+
+    def updateEvent(self):
+        """
+        Shows the event of the played position, while playing it's updated again at the end of the event
+        """
+        self.eventTimer.stop()
+        pos = self.position()
+        if self.events is not None:
+            i = self.events.find(pos)
+            if i is not None:
+                self.ev = epgEvent(*self.events.row(i))
+        ev = self.ev
+        btime = ev.getBeginTime()
+        self.session.screen['Event_Now'].newEvent(epgEvent(ev.getShortDescription(), ev.getEventId(), currTime() + btime - pos, ev.getDuration(), ev.getEventName()))
+        self.session.screen['Event_Next'].newEvent(epgEvent('', ev.getEventId(), btime, ev.getDuration(), ev.getArchiveBeginTimeString()))
+        if self.events is not None and myTimeStamp > 0 and btime <= pos < btime + ev.getDuration():
+            self.eventTimer.start((btime + ev.getDuration() - pos) * 1000 + 500, True)
+
+    def jumpToTime(self):
+        """
+        Asks the archive time to play as HHMM of the day of the played position
+        """
+        dialog = self.session.openWithCallback(self.jumpToTimeCallback, MinuteInput, basemins=int(time.strftime('%H%M', time.localtime(self.position()))))
+        dialog.setTitle(_('Jump to time, enter HHMM'))
+
+    def jumpToTimeCallback(self, value=0):
+        if not value:   # 0 is returned on cancel
+            return
+        hours, minutes = divmod(value, 100)
+        if hours > 23 or minutes > 59:
+            self.session.open(MessageBox, _('Invalid time %04d, enter it as HHMM: hours 00-23, minutes 00-59') % value, type=MessageBox.TYPE_ERROR, timeout=5)
+            return
+        day = time.localtime(self.position())
+        startTime = int(time.mktime(day[:3] + (hours, minutes, 0) + day[6:8] + (-1,)))
+        if startTime >= currTime():
+            startTime -= 86400  # the time of the previous day
+        self.seekTo(startTime)
+
+    def myjump(self, secondsJump=0):
+        secondsJump = { 0: 0,
+                        1: -config.seek.selfdefined_13.value,
+                        3: config.seek.selfdefined_13.value,
+                        4: -config.seek.selfdefined_46.value,
+                        6: config.seek.selfdefined_46.value,
+                        7: -config.seek.selfdefined_79.value,
+                        9: config.seek.selfdefined_79.value
+                      }.get(secondsJump, secondsJump)
+
+        self.seekTo(self.position() + secondsJump)  # calculate new archive startTime
+
+    def seekTo(self, startTime):
+        global myStartTime
+        global myTimeStamp
+        if currTime() > startTime:    # if not startTime in future
+            myStartTime = startTime   # save new startTime
+            myTimeStamp = currTime()  # save new timestamp
+            newRef = eServiceReference(self.strRef)
+            provider = getProvider(newRef.getPath())[1]
+            with latency.span(provider, 'archiveUrl'):
+                newRef.setPath(getArchiveUrl(newRef.getPath()))
+            with latency.span(provider, 'playService'):
+                self.session.nav.playService(newRef)  # start new service event
+            self.updateEvent()
+            self.doShow()
+
+
+def exportStatistics():
+    latency.export({'epgCache': epgCache.snapshot()})
+
+def showStatistics(session):
+    from Screens.TextBox import TextBox
+    exportStatistics()
+    session.open(TextBox, '\n\n'.join([x for x in (latency.report(), epgCache.report(), sourceStats.report(), hostHealth.report()) if x]) or _("No statistics yet"))
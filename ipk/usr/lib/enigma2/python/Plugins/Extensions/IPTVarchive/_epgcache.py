@@ -0,0 +1,241 @@
+# -*- coding:utf-8 -*-
+"""
+Caches of the EPG archive data shared by all plugin screens
+"""
+import os, sys, time, tempfile
+from hashlib import md5
+from threading import Lock
+from collections import OrderedDict
+
+PY3 = (sys.version_info[0] == 3)
+
+
+class DiskCache(object):
+    """
+    Persistent cache of the raw EPG payloads.
+
+    Every entry is a single file named by the md5 of its key. The file mtime is the time
+    the entry was stored or revalidated (used for TTL), the atime is the time it was read last (used for LRU eviction).
+    Entries are written to a temporary file and renamed, so a crash never leaves a partial entry.
+    The first line of the file keeps ETag and Last-Modified of the payload, so an expired entry
+    can be revalidated with a conditional request instead of the download.
+    """
+    SUFFIX = '.epg'
+    HEADER = b'#EPG '
+
+    def __init__(self, path, maxSize=4 * 1024 * 1024, ttl=None, defaultTTL=1800):
+        self.path = path
+        self.maxSize = maxSize       # bytes
+        self.ttl = ttl or {}         # provider -> seconds
+        self.defaultTTL = defaultTTL
+        self.counters = {'hit': 0, 'revalidated': 0, 'stale': 0, 'download': 0}
+        self.lock = Lock()
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def snapshot(self):
+        """
+        {hit, revalidated, stale, download}: the answers of downloadArchive by their source
+        """
+        with self.lock:
+            return dict(self.counters)
+
+    def report(self):
+        counters = self.snapshot()
+        if not any(counters.values()):
+            return ''
+        return 'EPG cache  ' + '  '.join('%s %d' % (name, counters[name]) for name in ('hit', 'revalidated', 'stale', 'download'))
+
+    def makeKey(self, *parts):
+        return md5('\n'.join([p.decode('utf-8') if isinstance(p, bytes) else '%s' % p for p in parts]).encode('utf-8')).hexdigest()
+
+    def getTTL(self, provider):
+        return self.ttl.get(provider, self.defaultTTL)
+
+    def entryPath(self, key):
+        return os.path.join(self.path, key + self.SUFFIX)
+
+    def open(self, provider, key):
+        """
+        Returns CacheEntry stored for the key or None if it's absent or expired without validators
+        """
+        fn = self.entryPath(key)
+        f = None
+        try:
+            mtime = os.stat(fn).st_mtime
+            f = open(fn, 'rb')
+            header = f.readline()
+            if not header.startswith(self.HEADER):
+                raise ValueError('No header')
+            header = header[len(self.HEADER):].rstrip(b'\r\n')
+            etag, lastModified = (header.decode('latin-1') if PY3 else header).split('\t')
+            fresh = time.time() - mtime <= self.getTTL(provider)
+            if not (fresh or etag or lastModified):
+                raise ValueError('Expired')
+            os.utime(fn, (time.time(), mtime))  # LRU mark, keep the store time
+            return CacheEntry(f, fresh, etag, lastModified)
+        except (IOError, OSError):
+            pass
+        except ValueError:
+            self.remove(key)
+        if f:
+            f.close()
+        return None
+
+    def renew(self, key):
+        """
+        Restarts TTL of the entry confirmed by the server
+        """
+        try:
+            os.utime(self.entryPath(key), None)
+        except OSError:
+            pass
+
+    def writer(self, key, etag=None, lastModified=None):
+        """
+        Returns the writer of a new payload for the key, it becomes visible on commit()
+        """
+        writer = CacheWriter(self, key)
+        header = ('%s\t%s\n' % (etag or '', lastModified or '')).replace('\r', '')
+        writer.write(self.HEADER + (header.encode('latin-1', 'replace') if PY3 else header))
+        return writer
+
+    def remove(self, key):
+        try:
+            os.remove(self.entryPath(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits into maxSize
+        """
+        entries, total, now = [], 0, time.time()
+        for fn in os.listdir(self.path):
+            fn = os.path.join(self.path, fn)
+            try:
+                st = os.stat(fn)
+                if fn.endswith('.tmp') and now - st.st_mtime > 60:  # left by an interrupted write
+                    os.remove(fn)
+            except OSError:
+                continue
+            if fn.endswith(self.SUFFIX):
+                entries.append((st.st_atime, st.st_size, fn))
+                total += st.st_size
+        entries.sort()
+        while total > self.maxSize and entries:
+            atime, size, fn = entries.pop(0)
+            try:
+                os.remove(fn)
+            except OSError:
+                pass
+            total -= size
+
+
+class CacheEntry(object):
+    """
+    Opened DiskCache entry: f is positioned at the payload
+    """
+
+    def __init__(self, f, fresh, etag, lastModified):
+        self.f = f
+        self.fresh = fresh
+        self.etag = etag
+        self.lastModified = lastModified
+
+    def conditionalHeaders(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.lastModified:
+            headers['If-Modified-Since'] = self.lastModified
+        return headers
+
+    def close(self):
+        self.f.close()
+
+
+class CacheWriter(object):
+    """
+    Writes the payload of DiskCache entry by chunks as it arrives.
+    The cache isn't essential, so the write errors just drop the entry
+    """
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.f = self.tmp = None
+        try:
+            if not os.path.isdir(cache.path):
+                os.makedirs(cache.path)
+            fd, self.tmp = tempfile.mkstemp(suffix='.tmp', dir=cache.path)
+            self.f = os.fdopen(fd, 'wb')
+        except (IOError, OSError):
+            self.abort()
+
+    def write(self, data):
+        if self.f:
+            try:
+                self.f.write(data)
+            except (IOError, OSError):
+                self.abort()
+
+    def commit(self):
+        if self.f:
+            try:
+                self.f.flush()
+                os.fsync(self.f.fileno())
+                self.f.close()
+                self.f = None
+                os.rename(self.tmp, self.cache.entryPath(self.key))
+                self.cache.evict()
+            except (IOError, OSError):
+                self.abort()
+
+    def abort(self):
+        try:
+            if self.f:
+                self.f.close()
+            if self.tmp:
+                os.remove(self.tmp)
+        except (IOError, OSError):
+            pass
+        self.f = self.tmp = None
+
+
+class MemoryCache(object):
+    """
+    Bounded LRU of the already parsed and sorted event lists by service reference.
+    Thread safe, the entries expire after the same per-provider TTL as DiskCache
+    """
+
+    def __init__(self, maxItems=16, ttl=None, defaultTTL=1800):
+        self.maxItems = maxItems
+        self.ttl = ttl or {}
+        self.defaultTTL = defaultTTL
+        self.items = OrderedDict()   # key -> (store time, provider, value)
+        self.lock = Lock()
+
+    def __contains__(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            return item is not None and time.time() - item[0] <= self.ttl.get(item[1], self.defaultTTL)
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.pop(key, None)
+            if item is None:
+                return None
+            if time.time() - item[0] > self.ttl.get(item[1], self.defaultTTL):
+                return None
+            self.items[key] = item   # move to the most recent end
+            return item[2]
+
+    def put(self, provider, key, value):
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = (time.time(), provider, value)
+            while len(self.items) > self.maxItems:
+                self.items.popitem(last=False)
@@ -0,0 +1,43 @@
+# -*- coding:utf-8 -*-
+"""
+Gluing of the archive events with the same title
+"""
+import re
+from operator import itemgetter
+
+GLUE_PATTERN = re.compile(r'(х|Х|м|М|x|X|т|Т|T)/(Ф|ф|С|C|с|c)|«|»|"', re.DOTALL)
+NUMBERS_PATTERN = re.compile(r'(\d+)')
+# "Часть" and "Выпуск" aren't episode marks: the parts of a film and the issues of a show are different programmes
+EPISODE = r'(?:(?:С|с)ерия|(?:С|с)ер\.|(?:Э|э)пизод|[Ee]pisode|[Ee]p\.)'
+# "Title. 12 серия", "Title (12-я серия)", "Title, Эпизод 3", "Title S01E02"
+SERIES_PATTERN = re.compile(r'[\s.,:;-]*[(\[]?\s*(?:\d+(?:-?(?:я|й|ая|ый))?\s*%s|%s\s*\d+|[Ss]\d+\s*[Ee]\d+)\s*[)\]]?\s*$' % (EPISODE, EPISODE))
+
+
+def glueTitle(title, groupSeries=False):
+    """
+    Normalized title: without the "х/ф", "м/с", ... marks and quotes, with groupSeries - without the episode number
+    """
+    title = GLUE_PATTERN.sub('', title).strip()
+    if groupSeries:
+        title = SERIES_PATTERN.sub('', title).rstrip(' .,:;-') or title
+    return title
+
+def naturalKey(text):
+    return [int(c) if c.isdigit() else c for c in NUMBERS_PATTERN.split(text)]
+
+def glueTitles(events, groupSeries=False):
+    """
+    Keeps the first of the events [descr, eventid, btime, duration, title] with the same normalized title,
+    sorted by the title in natural order ("2" < "10"). The title and its sort key are computed once per event
+    """
+    keyed = []
+    for ev in events:
+        title = glueTitle(ev[4], groupSeries)
+        keyed.append((naturalKey(title), title, ev))
+    keyed.sort(key=itemgetter(0))   # stable, so the newest event of the title goes first
+    seen, glued = set(), []
+    for key, title, ev in keyed:
+        if title not in seen:
+            seen.add(title)
+            glued.append(tuple(ev[:4]) + (title,))
+    return glued
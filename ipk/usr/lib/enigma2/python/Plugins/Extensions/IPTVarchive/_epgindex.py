@@ -0,0 +1,131 @@
+# -*- coding:utf-8 -*-
+"""
+Index of the EPG sources of the services from the E2m3u2bouquet userbouquets
+"""
+import os, sys, json, tempfile
+from threading import Lock
+
+PY3 = (sys.version_info[0] == 3)
+if PY3:
+    from urllib.parse import unquote
+else:
+    from urllib import unquote
+
+
+class EpgIndex(object):
+    """
+    Maps the url of every service of the userbouquets to resolve(url), e.g. (provider, hash, EPG url).
+
+    The index is kept per bouquet file with its mtime and saved to indexFile, so only the changed
+    bouquets are parsed again. The url is a part of the key, so an entry can't become stale:
+    the index is refreshed only when the url is missing. The missing urls are remembered
+    until a refresh finds a changed bouquet, so they don't scan the bouquets on every lookup.
+    """
+    PREFIX = 'userbouquet.suls_iptv_'   # bouquets written by E2m3u2bouquet
+    VERSION = 2     # 2 - the OTT-play mirrors of the native APIs are indexed too
+
+    def __init__(self, path, indexFile, resolve):
+        self.path = path            # directory of the bouquets, None - no bouquets to index
+        self.indexFile = indexFile
+        self.resolve = resolve      # url -> entry or None
+        self.files = None           # bouquet file name -> [mtime, {url: entry}]
+        self.entries = {}
+        self.misses = set()         # urls not found in the bouquets since the last change
+        self.lock = Lock()
+
+    def get(self, url):
+        """
+        Returns the entry of the url, it's resolved directly if the url isn't in the bouquets
+        """
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None and self.path and url not in self.misses:
+                self.refresh()
+                entry = self.entries.get(url)
+                if entry is None:
+                    self.misses.add(url)
+        return entry or self.resolve(url)
+
+    def load(self):
+        self.files = {}
+        try:
+            with open(self.indexFile) as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                for fn, (mtime, entries) in data['files'].items():
+                    if not PY3:  # keep the keys as str like the urls of the services
+                        fn = fn.encode('utf-8')
+                        entries = dict((url.encode('utf-8'), [x.encode('utf-8') if isinstance(x, unicode) else x for x in entry])
+                                       for url, entry in entries.items())
+                    self.files[fn] = [mtime, entries]
+        except (IOError, OSError, ValueError, TypeError, KeyError):
+            self.files = {}
+
+    def save(self):
+        try:
+            fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(self.indexFile))
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': self.VERSION, 'files': self.files}, f)
+            os.rename(tmp, self.indexFile)
+        except (IOError, OSError):
+            pass
+
+    def refresh(self):
+        """
+        Parses the new and changed bouquets again, forgets the removed ones.
+        Returns True if the index has changed
+        """
+        if self.files is None:
+            self.load()
+            self.entries = self.merge()
+        try:
+            names = [fn for fn in os.listdir(self.path) if fn.startswith(self.PREFIX)]
+        except OSError:
+            return False
+        changed = False
+        for fn in set(self.files) - set(names):
+            del self.files[fn]
+            changed = True
+        for fn in names:
+            try:
+                mtime = os.stat(os.path.join(self.path, fn)).st_mtime
+            except OSError:
+                continue
+            if fn in self.files and self.files[fn][0] == mtime:
+                continue
+            self.files[fn] = [mtime, self.parseBouquet(os.path.join(self.path, fn))]
+            changed = True
+        if changed:
+            self.entries = self.merge()
+            self.misses.clear()
+            self.save()
+        return changed
+
+    def merge(self):
+        entries = {}
+        for mtime, fileEntries in self.files.values():
+            entries.update(fileEntries)
+        return entries
+
+    def parseBouquet(self, fn):
+        """
+        #SERVICE 4097:0:1:0:0:0:0:0:0:0:http%3a//host/path#sapp_tvgid=id:Name
+        """
+        entries = {}
+        try:
+            with open(fn, 'rb') as f:
+                for line in f:
+                    if PY3:
+                        line = line.decode('utf-8', 'replace')
+                    if not line.startswith('#SERVICE '):
+                        continue
+                    ref = line[9:].strip().split(':')
+                    if len(ref) < 11 or not ref[10]:
+                        continue
+                    url = unquote(ref[10])
+                    entry = self.resolve(url)
+                    if entry is not None:
+                        entries[url] = list(entry)
+        except (IOError, OSError):
+            pass
+        return entries
@@ -0,0 +1,205 @@
+# -*- coding:utf-8 -*-
+"""
+Streaming parsers of the EPG archive payloads.
+
+The payload is fed by chunks as it arrives, every event is converted and checked against
+the archive depth as soon as it's complete, so memory depends on the number of kept events only.
+"""
+import sys, time, re, codecs
+try:
+    import simplejson as json
+except ImportError:
+    import json
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+from xml.sax.saxutils import unescape
+from ._epgstore import EventStore
+
+PY3 = (sys.version_info[0] == 3)
+
+
+class NoArchiveError(Exception):
+    """ The EPG source answered, but has no events for the channel """
+
+
+def xml_unescape(text):
+    """
+    This function transforms the "escaped" version suitable
+    for well-formed XML formatting into humanly-readable string.
+
+    Note that the default xml.sax.saxutils.unescape() function don't unescape
+    some characters and we have to manually add them to the entities dictionary.
+
+    :param text: The text that needs to be unescaped.
+    :type text: str
+    :rtype: str
+    """
+    text =  unescape(text, entities={r"&apos;": r"'", r"&quot;": r'"',
+                                    r"&#124;": r"|",
+                                    r"&#91;": r"[", r"&#93;": r"]", })
+
+    return text if PY3 else text.encode('utf-8')
+
+
+class ArchiveParser(object):
+    """
+    Base of the streaming parsers: feed(data) by chunks, then close() returns EventStore
+    of the events sorted by begin time (newest first).
+    Raises NoArchiveError if the payload has no events at all.
+    A subclass implements feed(data), it passes every complete event of the payload to addEvent()
+    """
+
+    def __init__(self, provider, days):
+        self.provider = provider
+        self.now = int(round(time.time()))
+        self.since = self.now - days * 86400   # 86400 - SECONDS_PER_DAY
+        self.seen = 0
+        self.events = EventStore()
+
+    def addEvent(self, btime, duration, title, descr, eventid=None):
+        self.seen += 1
+        if self.since < btime < self.now:
+            self.events.append(xml_unescape(descr or ''), eventid, btime, duration, xml_unescape(title or ''))
+
+    def close(self):
+        if not self.seen:
+            raise NoArchiveError()
+        return self.events.freeze()
+
+
+class XmlEventTarget(object):
+    """
+    XMLParser target collecting the fields of <event> elements without building the tree
+    """
+
+    def __init__(self, fields, callback):
+        self.fields = fields
+        self.callback = callback
+        self.event = None   # fields of the current event
+        self.text = None    # text chunks of the current field
+
+    def start(self, tag, attrib):
+        if tag == 'event':
+            self.event = dict(attrib)
+        elif self.event is not None and tag in self.fields:
+            self.text = []
+
+    def data(self, data):
+        if self.text is not None:
+            self.text.append(data)
+
+    def end(self, tag):
+        if self.text is not None:
+            self.event[tag] = ''.join(self.text)
+            self.text = None
+        elif tag == 'event' and self.event is not None:
+            ev, self.event = self.event, None
+            self.callback(ev)
+
+    def close(self):
+        pass
+
+
+class XmlArchiveParser(ArchiveParser):
+    """
+    shura & 1ott archive.xml:
+    <event id=""><name/><text/><start_time/><duration/></event>
+    """
+
+    def __init__(self, provider, days):
+        ArchiveParser.__init__(self, provider, days)
+        self.parser = ET.XMLParser(target=XmlEventTarget(('name', 'text', 'start_time', 'duration'), self.xmlEvent))
+
+    def xmlEvent(self, ev):
+        self.addEvent(int(ev['start_time']), int(ev['duration']), ev.get('name'), ev.get('text'), int(ev['id']))
+
+    def feed(self, data):
+        self.parser.feed(data)
+
+    def close(self):
+        self.parser.close()
+        return ArchiveParser.close(self)
+
+
+class JsonArchiveParser(ArchiveParser):
+    """
+    Reads the objects of the events array one by one as soon as they are complete:
+    itv                    {"res": [{"startTime", "stopTime", "title", "desc"}, ...]}
+    cbilling, tv.team, ... {"epg_data": [{"time", "time_to", "name", "descr"}, ...]}
+    OTT-play FOSS EPG      [{"time", "time_to", "name", "descr"}, ...]
+    """
+    SPACES = ' \t\r\n,'
+    ITV_FORMAT = (re.compile(r'"res"\s*:\s*'), ('startTime', 'stopTime', 'title', 'desc'))
+    EPG_DATA_FORMAT = (re.compile(r'"epg_data"\s*:\s*'), ('time', 'time_to', 'name', 'descr'))
+
+    def __init__(self, provider, days):
+        ArchiveParser.__init__(self, provider, days)
+        self.arrayKey, self.fields = self.ITV_FORMAT if provider == 'itv' else self.EPG_DATA_FORMAT
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buf = u''
+        self.pos = None     # position of the next array item in buf, None until the array is found
+        self.done = False   # end of the array is reached or there is no array
+
+    def findArray(self):
+        text = self.buf.lstrip()
+        if not text:
+            return
+        if text[0] == '[':
+            self.buf, self.pos = text, 1
+            return
+        m = self.arrayKey.search(text)
+        if m and m.end() < len(text):
+            if text[m.end()] == '[':
+                self.buf, self.pos = text, m.end() + 1
+            else:           # null or something else instead of the events
+                self.done = True
+
+    def feed(self, data):
+        if self.done:
+            return
+        self.buf += self.utf8.decode(data)
+        if self.pos is None:
+            self.findArray()
+            if self.pos is None:
+                return
+        buf, pos, fields = self.buf, self.pos, self.fields
+        while True:
+            while pos < len(buf) and buf[pos] in self.SPACES:
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == ']':
+                self.done = True
+                break
+            try:
+                ev, pos = self.decoder.raw_decode(buf, pos)
+            except ValueError:  # the item isn't complete yet
+                break
+            btime = int(ev.get(fields[0]))
+            self.addEvent(btime, int(ev.get(fields[1])) - btime, ev.get(fields[2]), ev.get(fields[3]))
+        self.buf, self.pos = buf[pos:], 0
+
+    def close(self):
+        self.feed(b'')
+        if self.pos is None and not self.done and self.buf.strip():
+            json.loads(self.buf)    # raises on broken data, otherwise it's the answer without events
+        elif self.pos is not None and not self.done:
+            raise ValueError('Truncated EPG data')
+        return ArchiveParser.close(self)
+
+
+def getArchiveParser(provider, days):
+    if provider in ('shura', '1ott'):
+        return XmlArchiveParser(provider, days)
+    return JsonArchiveParser(provider, days)
+
+def parseArchive(raw, provider, days):
+    """
+    Converts the whole raw EPG payload of the provider to EventStore of the events sorted by begin time (newest first)
+    """
+    parser = getArchiveParser(provider, days)
+    parser.feed(raw)
+    return parser.close()
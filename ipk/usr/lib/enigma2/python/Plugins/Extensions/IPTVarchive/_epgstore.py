@@ -0,0 +1,99 @@
+# -*- coding:utf-8 -*-
+"""
+Compact storage of the archive events of a channel
+"""
+from array import array
+from bisect import bisect_left
+from heapq import merge
+
+
+class EventStore(object):
+    """
+    Columnar list of the events [descr, eventid, btime, duration, title]:
+    the numbers are kept in parallel arrays, the texts in a table of unique strings
+    referenced by index, so the repeated titles and descriptions are stored once.
+    The event id is the one given by the provider or the begin time, so it's stable between reloads.
+    The ids of the providers don't fit array('l') of 32-bit boxes, they are kept in a list
+    """
+
+    def __init__(self):
+        self.btime = array('l')
+        self.duration = array('l')
+        self.eventid = []
+        self.title = array('l')     # index in strings
+        self.descr = array('l')     # index in strings
+        self.strings = []
+        self.index = {}             # string -> index in strings, dropped by freeze()
+        self.starts = None          # negated begin times in ascending order for bisect, built by find()
+
+    def __len__(self):
+        return len(self.btime)
+
+    def intern(self, text):
+        i = self.index.get(text)
+        if i is None:
+            i = self.index[text] = len(self.strings)
+            self.strings.append(text)
+        return i
+
+    def append(self, descr, eventid, btime, duration, title):
+        self.btime.append(btime)
+        self.duration.append(duration)
+        self.eventid.append(eventid or btime)
+        self.title.append(self.intern(title))
+        self.descr.append(self.intern(descr))
+
+    def freeze(self):
+        """
+        Sorts the events by begin time (newest first) and drops the data needed for appending only
+        """
+        order = sorted(range(len(self.btime)), key=self.btime.__getitem__, reverse=True)
+        for name in ('btime', 'duration', 'title', 'descr'):
+            column = getattr(self, name)
+            setattr(self, name, array('l', [column[i] for i in order]))
+        self.eventid = [self.eventid[i] for i in order]
+        self.index = None
+        self.starts = None
+        return self
+
+    @classmethod
+    def merge(cls, stores):
+        """
+        k-way merge of the frozen stores into a frozen one sorted newest first.
+        The events with the begin time of an already merged one (the same event in two slices) are dropped
+        """
+        merged, last = cls(), None
+        for negBtime, n, i in merge(*[sortKeys(n, store) for n, store in enumerate(stores)]):
+            if negBtime != last:
+                last = negBtime
+                merged.append(*stores[n].row(i))
+        merged.index = None
+        return merged
+
+    def find(self, t):
+        """
+        Returns the index of the event running at the time t or None, O(log n).
+        The next event is index - 1 as the events are sorted newest first
+        """
+        if self.starts is None:
+            self.starts = array('l', [-b for b in self.btime])
+        i = bisect_left(self.starts, -t)  # the newest event begun not later than t
+        if i < len(self.btime) and t < self.btime[i] + self.duration[i]:
+            return i
+        return None
+
+    def row(self, i):
+        s = self.strings
+        return (s[self.descr[i]], self.eventid[i], self.btime[i], self.duration[i], s[self.title[i]])
+
+    def rows(self):
+        """
+        The events as the list of tuples for the listbox
+        """
+        s = self.strings
+        return [(s[d], e, b, du, s[t]) for d, e, b, du, t in zip(self.descr, self.eventid, self.btime, self.duration, self.title)]
+
+
+def sortKeys(n, store):
+    """ (-begin time, n, index) of the events of the frozen store in ascending order """
+    return ((-btime, n, i) for i, btime in enumerate(store.btime))
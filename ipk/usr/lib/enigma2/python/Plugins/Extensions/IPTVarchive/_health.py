@@ -0,0 +1,160 @@
+# -*- coding:utf-8 -*-
+"""
+Adaptive timeouts and circuit breaker of the EPG hosts
+"""
+import os, sys, time, json, tempfile
+from threading import Lock
+
+PY3 = (sys.version_info[0] == 3)
+if PY3:
+    from urllib.error import URLError
+else:
+    from urllib2 import URLError
+
+
+class CircuitOpenError(URLError):
+    """ The host failed several times in a row, it isn't requested until its cool-down is over """
+
+
+class HostHealth(object):
+    """
+    Keeps the last answer times (to the response headers) and the failures of every host.
+
+    timeout(host) is factor * p95 of the answer times within [minTimeout, maxTimeout],
+    maxTimeout until minSamples answers are seen and after a failure, so the half-open probe
+    and a host slower than before get the full time until it answers again.
+    The circuit of the host opens after maxFailures failures in a row: allow(host) is False for coolDown seconds,
+    then a single probe request is let through (half-open). Its success closes the circuit,
+    its failure opens it again for twice as long, up to maxCoolDown.
+    The failures and circuits are kept in stateFile between sessions by load() and save(),
+    it's written only when they change. The answer times change on every request, they are kept
+    in samplesFile in the temp dir, so they don't wear the flash. Thread safe
+    """
+    VERSION = 2     # 2 - the answer times are kept in samplesFile
+
+    def __init__(self, stateFile=None, minTimeout=1.5, maxTimeout=5, factor=4, samples=32, minSamples=5,
+                 maxFailures=3, coolDown=30, maxCoolDown=1800, samplesFile=None):
+        self.stateFile = stateFile or os.path.join(tempfile.gettempdir(), 'iptvarchive.health')
+        self.samplesFile = samplesFile or os.path.join(tempfile.gettempdir(), 'iptvarchive.samples')
+        self.minTimeout = minTimeout
+        self.maxTimeout = maxTimeout
+        self.factor = factor
+        self.samples = samples
+        self.minSamples = minSamples
+        self.maxFailures = maxFailures
+        self.coolDown = coolDown
+        self.maxCoolDown = maxCoolDown
+        self.hosts = {}         # host -> {'times': [seconds], 'failures': n, 'openUntil': time, 'coolDown': seconds}
+        self.probing = set()    # hosts with the half-open probe in flight
+        self.changed = False    # failures or circuits, saved to stateFile
+        self.samplesChanged = False
+        self.lock = Lock()
+
+    def state(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = {'times': [], 'failures': 0, 'openUntil': 0, 'coolDown': 0}
+        return state
+
+    def timeout(self, host):
+        with self.lock:
+            state = self.hosts.get(host, {})
+            times = sorted(state.get('times', ()))
+            failed = state.get('failures', 0)
+        if failed or len(times) < self.minSamples:
+            return self.maxTimeout
+        return min(self.maxTimeout, max(self.minTimeout, self.factor * times[int(0.95 * (len(times) - 1))]))
+
+    def allow(self, host):
+        """
+        False while the circuit of the host is open, True for one probe at a time after the cool-down
+        """
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None or state['failures'] < self.maxFailures:
+                return True
+            if time.time() < state['openUntil'] or host in self.probing:
+                return False
+            self.probing.add(host)
+            return True
+
+    def success(self, host, seconds):
+        with self.lock:
+            state = self.state(host)
+            state['times'].append(round(seconds, 4))
+            del state['times'][:-self.samples]
+            if state['failures'] or state['coolDown']:
+                state['failures'] = state['coolDown'] = 0
+                self.changed = True
+            self.probing.discard(host)
+            self.samplesChanged = True
+
+    def failure(self, host):
+        with self.lock:
+            state = self.state(host)
+            state['failures'] += 1
+            if state['failures'] >= self.maxFailures:
+                state['coolDown'] = min(state['coolDown'] * 2, self.maxCoolDown) if state['coolDown'] else self.coolDown
+                state['openUntil'] = time.time() + state['coolDown']
+            self.probing.discard(host)
+            self.changed = True
+
+    def release(self, host):
+        """
+        The request to the host was cancelled: frees its probe slot, nothing is recorded
+        """
+        with self.lock:
+            self.probing.discard(host)
+
+    def load(self):
+        for fn, fields in ((self.stateFile, ('failures', 'openUntil', 'coolDown')), (self.samplesFile, ('times',))):
+            try:
+                with open(fn) as f:
+                    data = json.load(f)
+                if data.get('version') != self.VERSION:
+                    continue
+                with self.lock:
+                    for host, saved in data['hosts'].items():
+                        state = self.state(host if PY3 else host.encode('utf-8'))
+                        for field in fields:
+                            state[field] = saved[field]
+            except (IOError, OSError, ValueError, AttributeError, KeyError, TypeError):
+                pass
+
+    def save(self):
+        with self.lock:
+            files = []
+            if self.changed:
+                files.append((self.stateFile, dict((host, {'failures': state['failures'], 'openUntil': state['openUntil'],
+                                                           'coolDown': state['coolDown']})
+                                                   for host, state in self.hosts.items() if state['failures'] or state['coolDown'])))
+            if self.samplesChanged:
+                files.append((self.samplesFile, dict((host, {'times': state['times']}) for host, state in self.hosts.items())))
+            files = [(fn, json.dumps({'version': self.VERSION, 'hosts': hosts})) for fn, hosts in files]
+            self.changed = self.samplesChanged = False
+        for fn, data in files:
+            try:
+                fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(fn))
+                with os.fdopen(fd, 'w') as f:
+                    f.write(data)
+                os.rename(tmp, fn)
+            except (IOError, OSError):
+                pass
+
+    def report(self):
+        """
+        Text table of the hosts: timeout and the circuit state
+        """
+        with self.lock:
+            hosts = dict((host, dict(state)) for host, state in self.hosts.items())
+        now, lines = time.time(), []
+        for host in sorted(hosts):
+            state = hosts[host]
+            if state['failures'] < self.maxFailures:
+                circuit = 'closed'
+            elif now < state['openUntil']:
+                circuit = 'open %ds' % (state['openUntil'] - now)
+            else:
+                circuit = 'half-open'
+            lines.append('%-28s timeout %4.1f s  %s' % (host, self.timeout(host), circuit))
+        return '\n'.join(lines)
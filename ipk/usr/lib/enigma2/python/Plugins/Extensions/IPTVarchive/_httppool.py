@@ -0,0 +1,254 @@
+# -*- coding:utf-8 -*-
+"""
+Persistent HTTP connections to the EPG APIs
+"""
+import sys, time, socket
+from threading import Lock
+from timeit import default_timer as timer
+from ._health import CircuitOpenError
+
+PY3 = (sys.version_info[0] == 3)
+if PY3:
+    from http.client import HTTPConnection, HTTPSConnection, HTTPException
+    from urllib.error import URLError, HTTPError
+    from urllib.parse import urlsplit, urljoin
+else:
+    from httplib import HTTPConnection, HTTPSConnection, HTTPException
+    from urllib2 import URLError, HTTPError
+    from urlparse import urlsplit, urljoin
+
+
+class Cancelled(Exception):
+    """ The request was cancelled with its CancelToken """
+
+
+class CancelToken(object):
+    """
+    Cancels the requests sent with it from another thread: cancel() shuts down their sockets,
+    so the blocking wait for the response or read of the body returns at once and raises Cancelled.
+    The token made with the parent is cancelled with it
+    """
+
+    def __init__(self, parent=None):
+        self.cancelled = False
+        self.conns = set()  # connections of the requests in flight
+        self.children = []
+        self.lock = Lock()
+        if parent is not None:
+            with parent.lock:
+                parent.children.append(self)
+                self.cancelled = parent.cancelled
+
+    def attach(self, conn):
+        with self.lock:
+            if self.cancelled:
+                raise Cancelled()
+            self.conns.add(conn)
+
+    def detach(self, conn):
+        with self.lock:
+            self.conns.discard(conn)
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled()
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            conns = list(self.conns)
+            children = list(self.children)
+        for child in children:
+            child.cancel()
+        for conn in conns:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except (AttributeError, socket.error):
+                pass
+
+
+class ConnectionPool(object):
+    """
+    Keeps up to maxIdlePerHost idle keep-alive connections per (scheme, host, port) for idleTimeout seconds.
+    The concurrent requests aren't limited: a request finding no idle connection opens a new one,
+    it's closed after the response if the host has maxIdlePerHost idle connections already.
+    A reused connection closed by the server meanwhile is reconnected once.
+    Thread safe, the errors are raised as by urlopen: URLError and HTTPError.
+    With HostHealth the timeout of every request is taken from it, the answers and failures of the host are
+    reported to it and the host with the open circuit isn't requested: CircuitOpenError is raised at once.
+    The request sent with CancelToken raises Cancelled when it's cancelled, this isn't a failure of the host
+    """
+    MAX_REDIRECTS = 5
+
+    def __init__(self, maxIdlePerHost=2, idleTimeout=30, timeout=5, health=None):
+        self.maxIdlePerHost = maxIdlePerHost
+        self.idleTimeout = idleTimeout
+        self.timeout = timeout
+        self.health = health
+        self.idle = {}      # host key -> [(time of release, connection)], the most recent last
+        self.received = 0   # bytes of the response bodies
+        self.lock = Lock()
+
+    def acquire(self, key):
+        """
+        Returns (connection, True if it's reused) for the host key
+        """
+        now = time.time()
+        with self.lock:
+            conns = self.idle.get(key, [])
+            while conns:
+                released, conn = conns.pop()
+                if now - released < self.idleTimeout:
+                    return conn, True
+                conn.close()
+        scheme, host, port = key
+        return (HTTPSConnection if scheme == 'https' else HTTPConnection)(host, port, timeout=self.timeout), False
+
+    def release(self, key, conn, reuse=True):
+        with self.lock:
+            conns = self.idle.setdefault(key, [])
+            if reuse and len(conns) < self.maxIdlePerHost:
+                conns.append((time.time(), conn))
+                return
+        conn.close()
+
+    def clear(self):
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for conns in idle.values():
+            for released, conn in conns:
+                conn.close()
+
+    def urlopen(self, request, extraHeaders=None, cancel=None):
+        """
+        Sends urllib Request with the extra headers and returns the response with read(), info(), geturl() and close(),
+        the redirects are followed. 304 Not Modified is returned as the response too.
+        cancel is CancelToken or None
+        """
+        url, method, data = request.get_full_url(), request.get_method(), request.data
+        headers = dict(request.header_items())
+        headers.update(extraHeaders or {})
+        if data is not None and not any(h.lower() == 'content-type' for h in headers):
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        for redirect in range(self.MAX_REDIRECTS + 1):
+            resp = self.send(url, method, data, headers, cancel)
+            if resp.status in (301, 302, 303, 307, 308) and resp.getheader('Location') and redirect < self.MAX_REDIRECTS:
+                location = urljoin(url, resp.getheader('Location'))
+                resp.close()
+                if resp.status not in (307, 308):
+                    method, data = 'GET', None
+                    headers.pop('Content-Type', None)
+                url = location
+                continue
+            if resp.status >= 400:
+                hdrs = resp.info()
+                resp.close()
+                raise HTTPError(url, resp.status, resp.reason, hdrs, None)
+            return resp
+
+    def send(self, url, method, data, headers, cancel=None):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise URLError('unknown url type: %s' % url)
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+        path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        health, hostName = self.health, '%s:%d' % key[1:]
+        timeout = self.timeout
+        if health is not None:
+            if not health.allow(hostName):
+                raise CircuitOpenError('circuit open: %s' % hostName)
+            timeout = health.timeout(hostName)
+        while True:
+            conn, reused = self.acquire(key)
+            try:
+                if cancel is not None:
+                    cancel.attach(conn)
+                start = timer()
+                if reused and conn.sock is None:    # closed by the server after the last response
+                    reused = False
+                if reused:
+                    conn.sock.settimeout(timeout)
+                else:
+                    conn.timeout = timeout
+                    conn.connect()
+                connected = timer()
+                if cancel is not None:
+                    cancel.check()  # cancelled while connecting
+                conn.request(method, path, data, headers)
+                resp = PooledResponse(self, key, conn, conn.getresponse(), url, cancel)
+                resp.connectTime = None if reused else connected - start
+                resp.ttfb = timer() - connected
+                if health is not None:
+                    if resp.status >= 500:
+                        health.failure(hostName)
+                    else:
+                        health.success(hostName, resp.ttfb)
+                return resp
+            except Exception as e:
+                self.release(key, conn, False)
+                if cancel is not None:
+                    cancel.detach(conn)
+                    if cancel.cancelled:
+                        if health is not None:
+                            health.release(hostName)
+                        raise Cancelled()
+                if reused and isinstance(e, (socket.error, HTTPException)) and not isinstance(e, socket.timeout):
+                    continue    # stale keep-alive connection, try again with a new one
+                if health is not None:
+                    health.failure(hostName)
+                if isinstance(e, (socket.error, HTTPException)):
+                    raise URLError(e)
+                raise
+
+
+class PooledResponse(object):
+    """
+    The response returns its connection to the pool on close() if the body was read completely
+    and the server keeps the connection alive (not HTTP/1.0 or Connection: close).
+    read() of the cancelled response raises Cancelled
+    """
+
+    def __init__(self, pool, key, conn, resp, url, cancel=None):
+        self.pool = pool
+        self.key = key
+        self.conn = conn
+        self.resp = resp
+        self.url = url
+        self.cancel = cancel
+        self.status = resp.status
+        self.reason = resp.reason
+        self.connectTime = None # seconds to connect, None for the reused connection
+        self.ttfb = 0.0         # seconds from the request to the response headers
+
+    def read(self, amt=None):
+        try:
+            data = self.resp.read(amt)
+        except Exception:
+            if self.cancel is not None:
+                self.cancel.check()
+            raise
+        if self.cancel is not None:
+            self.cancel.check()     # the shut down socket reads as the end of the body
+        with self.pool.lock:
+            self.pool.received += len(data)
+        return data
+
+    def info(self):
+        return self.resp.msg
+
+    def getheader(self, name, default=None):
+        return self.resp.getheader(name, default)
+
+    def geturl(self):
+        return self.url
+
+    def close(self):
+        if self.conn is None:
+            return
+        complete = self.resp.isclosed() and not self.resp.will_close
+        self.resp.close()
+        if self.cancel is not None:
+            self.cancel.detach(self.conn)
+            complete = complete and not self.cancel.cancelled
+        self.pool.release(self.key, self.conn, complete)
+        self.conn = None
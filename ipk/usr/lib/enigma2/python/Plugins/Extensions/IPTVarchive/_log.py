@@ -0,0 +1,127 @@
+# -*- coding:utf-8 -*-
+"""
+Buffered log of the plugin
+"""
+import os, sys, time, traceback
+from threading import Thread, Lock, Event
+from collections import deque
+
+PY3 = (sys.version_info[0] == 3)
+
+DEBUG, INFO, WARNING, ERROR, OFF = 10, 20, 30, 40, 100
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+
+
+class Logger(object):
+    """
+    The records below level are dropped at once, the rest are put into a ring buffer of bufferSize records
+    and written by a background thread every flushInterval seconds (at once for ERROR).
+    The messages are %-formatted with args by the writer, so the disabled calls cost a comparison only.
+    The file is rotated to fileName.1 ... fileName.<backups> when it grows over maxSize bytes
+    """
+
+    def __init__(self, fileName, level=WARNING, maxSize=256 * 1024, backups=2, bufferSize=1000, flushInterval=2):
+        self.fileName = fileName
+        self.level = level
+        self.maxSize = maxSize
+        self.backups = backups
+        self.flushInterval = flushInterval
+        self.records = deque(maxlen=bufferSize)   # (time, level, msg, args)
+        self.dropped = 0        # records lost as the buffer was full
+        self.wakeup = Event()
+        self.lock = Lock()      # serializes the writes to the file
+        self.writer = None
+
+    def isEnabledFor(self, level):
+        return level >= self.level
+
+    def log(self, level, msg, *args):
+        if level < self.level:
+            return
+        if len(self.records) == self.records.maxlen:
+            self.dropped += 1
+        self.records.append((time.time(), level, msg, args))
+        if self.writer is None:
+            self.writer = Thread(target=self.run)
+            self.writer.daemon = True
+            self.writer.start()
+        if level >= ERROR:
+            self.wakeup.set()
+
+    def debug(self, msg, *args):
+        if DEBUG >= self.level:
+            self.log(DEBUG, msg, *args)
+
+    def info(self, msg, *args):
+        if INFO >= self.level:
+            self.log(INFO, msg, *args)
+
+    def warning(self, msg, *args):
+        if WARNING >= self.level:
+            self.log(WARNING, msg, *args)
+
+    def error(self, msg, *args):
+        if ERROR >= self.level:
+            self.log(ERROR, msg, *args)
+
+    def exception(self, msg='', *args, **kwargs):
+        """
+        Logs msg % args with the traceback of exc_info keyword or of the exception being handled, level keyword is ERROR by default
+        """
+        level = kwargs.get('level', ERROR)
+        if level >= self.level:
+            # formatted now, the traceback keeps the frames alive
+            tb = ''.join(traceback.format_exception(*(kwargs.get('exc_info') or sys.exc_info()))).rstrip()
+            if not args:    # msg isn't a format then, like in the other calls without args
+                msg = msg.replace('%', '%%')
+            self.log(level, (msg and msg + '\n') + '%s', *(args + (tb,)))
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.flushInterval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered records to the file
+        """
+        with self.lock:
+            lines = []
+            while self.records:
+                t, level, msg, args = self.records.popleft()
+                try:
+                    text = msg % args if args else msg
+                except Exception:
+                    text = '%s %r' % (msg, args)
+                if not PY3 and isinstance(text, unicode):
+                    text = text.encode('utf-8')
+                lines.append('%s.%03d %s %s\n' % (time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t)), int(t * 1000) % 1000,
+                                                 LEVEL_NAMES.get(level, level), text))
+            if self.dropped:
+                lines.append('%d records dropped\n' % self.dropped)
+                self.dropped = 0
+            if not lines:
+                return
+            data = ''.join(lines)
+            if PY3:
+                data = data.encode('utf-8', 'replace')
+            try:
+                self.rotate(len(data))
+                with open(self.fileName, 'ab') as f:
+                    f.write(data)
+            except (IOError, OSError):
+                pass
+
+    def rotate(self, size):
+        try:
+            if os.path.getsize(self.fileName) + size <= self.maxSize:
+                return
+        except OSError:
+            return
+        for i in range(self.backups, 0, -1):
+            src = '%s.%d' % (self.fileName, i - 1) if i > 1 else self.fileName
+            if os.path.exists(src):
+                os.rename(src, '%s.%d' % (self.fileName, i))
+        if not self.backups:
+            os.remove(self.fileName)
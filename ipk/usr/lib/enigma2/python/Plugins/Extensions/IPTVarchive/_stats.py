@@ -0,0 +1,151 @@
+# -*- coding:utf-8 -*-
+"""
+Latency histograms of the plugin hot paths
+"""
+import os, json, tempfile
+from threading import Lock
+from timeit import default_timer as timer
+from bisect import bisect_left
+
+# upper bounds of the histogram buckets in ms: 0.1 ms ... ~10 min, 25% apart
+BUCKETS = [round(0.1 * 1.25 ** i, 3) for i in range(71)]
+
+
+class Histogram(object):
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(BUCKETS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        """
+        Upper bound of the bucket holding the p-th percentile, ms
+        """
+        rank, seen = p / 100.0 * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return 0.0
+
+    def summary(self):
+        return {'count': self.count, 'mean': round(self.total / self.count, 3) if self.count else 0.0,
+                'p50': self.percentile(50), 'p95': self.percentile(95), 'p99': self.percentile(99), 'max': round(self.max, 3)}
+
+
+class Span(object):
+    """
+    with stats.span(provider, name): ... records the duration of the block
+    """
+    __slots__ = ('stats', 'provider', 'name', 'start')
+
+    def __init__(self, stats, provider, name):
+        self.stats = stats
+        self.provider = provider
+        self.name = name
+
+    def __enter__(self):
+        self.start = timer()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.record(self.provider, self.name, timer() - self.start)
+
+
+class LatencyStats(object):
+    """
+    Thread safe per provider histograms of the spans: resolve, request, connect, ttfb, download, decompress, parse,
+    sort, setList, open (onCreate -> list shown), archiveUrl, playService
+    """
+
+    def __init__(self, exportFile=None):
+        self.exportFile = exportFile or os.path.join(tempfile.gettempdir(), 'iptv_archive_stats.json')
+        self.histograms = {}    # (provider, span) -> Histogram
+        self.lock = Lock()
+
+    def span(self, provider, name):
+        return Span(self, provider, name)
+
+    def record(self, provider, name, seconds):
+        with self.lock:
+            key = (provider or 'unknown', name)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.add(seconds * 1000)
+
+    def snapshot(self):
+        """
+        {provider: {span: {count, mean, p50, p95, p99, max}}}, the times are in ms
+        """
+        result = {}
+        with self.lock:
+            for (provider, name), histogram in self.histograms.items():
+                result.setdefault(provider, {})[name] = histogram.summary()
+        return result
+
+    def export(self, extra=None):
+        """
+        Writes snapshot() to exportFile, the extra {name: data} are written along with the providers
+        """
+        data = self.snapshot()
+        data.update(extra or {})
+        try:
+            fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(self.exportFile))
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.rename(tmp, self.exportFile)
+        except (IOError, OSError):
+            pass
+
+    def report(self):
+        """
+        Text table of the spans by provider
+        """
+        lines = []
+        for provider, spans in sorted(self.snapshot().items()):
+            lines.append(provider)
+            for name, s in sorted(spans.items()):
+                lines.append('  %-12s %6d  p50 %8.1f  p95 %8.1f  p99 %8.1f ms' % (name, s['count'], s['p50'], s['p95'], s['p99']))
+        return '\n'.join(lines)
+
+
+class SourceStats(object):
+    """
+    Thread safe per provider record of the alternative EPG sources: requests, wins (the first valid answer)
+    and the moving average of the answer time, a failure counts as failPenalty seconds.
+    order() puts the source with the lowest average first, the untried ones before the rest
+    """
+    ALPHA = 0.3     # weight of the last answer in the average
+
+    def __init__(self, failPenalty=5.0):
+        self.failPenalty = failPenalty
+        self.sources = {}       # (provider, source) -> [requests, wins, average seconds]
+        self.lock = Lock()
+
+    def record(self, provider, source, seconds, ok, won):
+        with self.lock:
+            stats = self.sources.get((provider, source))
+            if stats is None:
+                stats = self.sources[(provider, source)] = [0, 0, seconds if ok else self.failPenalty]
+            stats[0] += 1
+            stats[1] += won and 1 or 0
+            stats[2] += self.ALPHA * ((seconds if ok else self.failPenalty) - stats[2])
+
+    def order(self, provider, sources):
+        with self.lock:
+            return sorted(sources, key=lambda s: self.sources.get((provider, s), (0, 0, 0.0))[2])
+
+    def report(self):
+        with self.lock:
+            return '\n'.join('%-12s %-8s %6d  wins %6d  avg %8.1f ms' % (provider, source, stats[0], stats[1], stats[2] * 1000)
+                             for (provider, source), stats in sorted(self.sources.items()))
@@ -9,6 +9,25 @@ long_description_content_type = text/x-rst
 url = https://github.com/vgbundo/ppxxh
 
 363de45, small fixes by prog4dood
+
+xxh32_int() and hash_many() are the stateless one-shot interface, they use
+the python-xxhash C extension when it's installed.
+Reference digests (the same on Python 2 and 3, with and without the extension):
+
+>>> '%08x' % xxh32_int(b'')
+'02cc5d05'
+>>> '%08x' % xxh32_int(b'a')
+'550d7456'
+>>> '%08x' % xxh32_int(b'abc')
+'32d153ff'
+>>> '%08x' % xxh32_int(b'0123456789abcdef')
+'c2c45b69'
+>>> '%08x' % xxh32_int(b'Nobody inspects the spammish repetition')
+'e2293b2f'
+>>> '%08x' % xxh32_int(b'This is a bytes object, not a string!', 2523184290)
+'d8b35729'
+>>> hash_many([u'1tv-hd', b'a'])
+[1663482809, 1426945110]
 """
 import struct
 
@@ -177,9 +196,9 @@ class xxh32:
         tmpbuffer = self._buffer[-n_extra:] if n_extra else b""
 
         # process remaining bytes from tmpbuffer, 1 byte at a time
-        for b in tmpbuffer:
+        for b in bytearray(tmpbuffer):
             output = (
-                self._r((output + ord(b) * self._P5) & self._M32, 11) * self._P1
+                self._r((output + b * self._P5) & self._M32, 11) * self._P1
             ) & self._M32
 
         # mix bits and return output
@@ -208,12 +227,11 @@ class xxh32:
         This is the value returned by ``digest()`` expressed as a
         printable hex string for easy display.
         """
-        # bytes.hex() is simpler, but not available For Python <= 3.4
-        return "".join("{0:0>2x}".format(ord(b)) for b in self.digest())
+        return "%08x" % self.intdigest()
 
     def copy(self):
         """Return a copy (clone) of the hash object."""
-        cp = __class__()  # create a new instance
+        cp = xxh32()  # create a new instance
         # copy current state to the new instance
         cp._s0 = self._s0
         cp._s1 = self._s1
@@ -222,3 +240,67 @@ class xxh32:
         cp._total_length = self._total_length
         cp._buffer = self._buffer
         return cp
+
+
+_P1, _P2, _P3, _P4, _P5, _M32 = xxh32._P1, xxh32._P2, xxh32._P3, xxh32._P4, xxh32._P5, xxh32._M32
+
+try:
+    # python-xxhash >= 2.0
+    from xxhash import xxh32_intdigest as _intdigest
+except ImportError:
+    _intdigest = None
+
+
+def _xxh32_int(data, seed=0):
+    # one-shot XXH32: all the 32-bit words are unpacked at once,
+    # the state lives in locals and the rotations are inlined
+    length = len(data)
+    nwords = length >> 2
+    words = struct.unpack_from("<%dI" % nwords, data) if nwords else ()
+    i = 0
+    if length >= 16:
+        v1 = (seed + _P1 + _P2) & _M32
+        v2 = (seed + _P2) & _M32
+        v3 = seed
+        v4 = (seed - _P1) & _M32
+        i = (length >> 4) << 2     # words of the whole stripes
+        for b1, b2, b3, b4 in zip(words[0:i:4], words[1:i:4], words[2:i:4], words[3:i:4]):
+            v1 = (v1 + b1 * _P2) & _M32
+            v1 = (((v1 << 13) | (v1 >> 19)) & _M32) * _P1 & _M32
+            v2 = (v2 + b2 * _P2) & _M32
+            v2 = (((v2 << 13) | (v2 >> 19)) & _M32) * _P1 & _M32
+            v3 = (v3 + b3 * _P2) & _M32
+            v3 = (((v3 << 13) | (v3 >> 19)) & _M32) * _P1 & _M32
+            v4 = (v4 + b4 * _P2) & _M32
+            v4 = (((v4 << 13) | (v4 >> 19)) & _M32) * _P1 & _M32
+        h = (((v1 << 1) | (v1 >> 31)) + ((v2 << 7) | (v2 >> 25)) +
+             ((v3 << 12) | (v3 >> 20)) + ((v4 << 18) | (v4 >> 14)))
+    else:
+        h = seed + _P5
+    h = (h + length) & _M32
+    for b in words[i:]:
+        h = (h + b * _P3) & _M32
+        h = (((h << 17) | (h >> 15)) & _M32) * _P4 & _M32
+    for b in bytearray(data[nwords << 2:]):
+        h = (h + b * _P5) & _M32
+        h = (((h << 11) | (h >> 21)) & _M32) * _P1 & _M32
+    h = ((h ^ (h >> 15)) * _P2) & _M32
+    h = ((h ^ (h >> 13)) * _P3) & _M32
+    return h ^ (h >> 16)
+
+
+def xxh32_int(data, seed=0):
+    """Return XXH32 of data as a 32-bit unsigned integer.
+
+    Stateless and thread safe. Text is hashed as utf-8.
+    """
+    if not isinstance(data, (bytes, bytearray)):
+        data = data.encode("utf-8")
+    if seed < 0 or seed > 0xFFFFFFFF:
+        raise ValueError("Seed must be a 32-bit unsigned integer.")
+    return (_intdigest or _xxh32_int)(data, seed)
+
+
+def hash_many(ids, seed=0):
+    """Return the list of XXH32 integers of the ids (bytes or text)."""
+    return [xxh32_int(i, seed) for i in ids]